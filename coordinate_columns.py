@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""緯度経度列の列単位 (カラムナ) 変換
+行ごとに parse_lat/parse_lon (DMS 正規表現 + float) を呼ぶ代わりに、ブロック内の緯度/経度の文字列を
+まとめて配列にし、単純な 10 進数のセルを NumPy で一括変換する。
+- 範囲チェックは配列のマスクで行い、10 進数でない残りのセルだけを parse_dms に通す
+- 結果とエラー文字列は parse_lat/parse_lon を行ごとに呼んだ場合と同じ (緯度のエラーを優先)
+- 列の表記形式 (coordinate_parser.classify_format) を渡すと、残りのセルは形式専用のパーサで変換し、
+  10 進数でない形式の列は一括変換を試みない。結合形式 ("緯度,経度") は先に 2 列へ分ける
+- memo (coordinate_parser.ParseMemo) を渡すと、一括変換に乗らないセルの変換結果を再利用する
+- NumPy が無い環境ではブロック単位の逐次変換にフォールバックする
+- QGIS モジュールに依存しない (並列パーサのワーカーでも使用)
+"""
+from __future__ import annotations
+from array import array
+from typing import Dict, Optional, Sequence, Tuple
+
+from .coordinate_parser import (
+    parse_lat, parse_lon, parser_for, split_combined,
+    COMBINED_FORMATS, FORMAT_DECIMAL, FORMAT_GENERIC, ParseMemo,
+)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NAN = float('nan')
+# これ未満のブロックは配列化のコストの方が大きいため逐次変換
+MIN_VECTOR = 64
+LAT_RANGE = 90.0
+LON_RANGE = 180.0
+
+
+def _parse_block_python(lat_texts: Sequence[str], lon_texts: Sequence[str],
+                        lat_parse, lon_parse) -> Tuple[array, array, Dict[int, str]]:
+    lats = array('d')
+    lons = array('d')
+    errors: Dict[int, str] = {}
+    for i, (t_lat, t_lon) in enumerate(zip(lat_texts, lon_texts)):
+        try:
+            lat = parse_lat(t_lat, lat_parse)
+            lon = parse_lon(t_lon, lon_parse)
+        except Exception as e:
+            lat = lon = NAN
+            errors[i] = str(e)
+        lats.append(lat)
+        lons.append(lon)
+    return lats, lons, errors
+
+
+def _decimal_values(texts: Sequence[str]):
+    """単純な 10 進数のセルを float64 に変換した配列と、変換できたセルのマスク。"""
+    a = np.char.strip(np.asarray(texts, dtype=str))
+    body = np.char.lstrip(a, '+-')
+    one_sign = (np.char.str_len(a) - np.char.str_len(body)) <= 1
+    plain = one_sign & np.char.isdigit(np.char.replace(body, '.', '', 1))
+    values = np.full(len(a), np.nan)
+    if plain.any():
+        try:
+            values[plain] = a[plain].astype(np.float64)
+        except ValueError:
+            # 全角数字等: 該当ブロックは残りのセルとして扱う
+            plain[:] = False
+    return values, plain
+
+
+def _column(texts: Sequence[str], limit: float, label: str, errors: Dict[int, str], fmt: str, parse):
+    """1 列分を変換する。失敗した行は errors に記録 (既に記録済みの行は上書きしない) し NaN にする。"""
+    if fmt in (FORMAT_DECIMAL, FORMAT_GENERIC):
+        values, plain = _decimal_values(texts)
+    else:
+        values = np.full(len(texts), np.nan)
+        plain = np.zeros(len(texts), dtype=bool)
+    for i in np.flatnonzero(~plain).tolist():
+        if i in errors:
+            continue
+        try:
+            values[i] = parse(texts[i])
+        except Exception as e:
+            errors[i] = str(e)
+    out = ~(np.abs(values) <= limit)
+    for i in np.flatnonzero(out).tolist():
+        if i not in errors:
+            errors[i] = f'{label} out of range'
+    return values
+
+
+def parse_block(lat_texts: Sequence[str], lon_texts: Sequence[str],
+                lat_format: str = FORMAT_GENERIC, lon_format: str = FORMAT_GENERIC,
+                memo: Optional[ParseMemo] = None) -> Tuple[array, array, Dict[int, str]]:
+    """緯度/経度の文字列列を変換し、(lat, lon, {行番号: エラー}) を返す。失敗行は両方 NaN。
+
+    lat_format が結合形式なら lat_texts の各セルから緯度と経度を取り出す (lon_texts は使わない)。
+    """
+    if lat_format in COMBINED_FORMATS:
+        lat_texts, lon_texts = split_combined(lat_texts, lat_format)
+        lat_format = lon_format = FORMAT_DECIMAL
+    if memo is not None:
+        lat_parse = memo.parser(lat_format)
+        lon_parse = memo.parser(lon_format)
+    else:
+        lat_parse = parser_for(lat_format)
+        lon_parse = parser_for(lon_format)
+    if np is None or len(lat_texts) < MIN_VECTOR:
+        return _parse_block_python(lat_texts, lon_texts, lat_parse, lon_parse)
+    errors: Dict[int, str] = {}
+    lat = _column(lat_texts, LAT_RANGE, 'Latitude', errors, lat_format, lat_parse)
+    lon = _column(lon_texts, LON_RANGE, 'Longitude', errors, lon_format, lon_parse)
+    if errors:
+        bad = np.fromiter(errors.keys(), dtype=np.intp, count=len(errors))
+        lat[bad] = np.nan
+        lon[bad] = np.nan
+    lats = array('d')
+    lats.frombytes(lat.tobytes())
+    lons = array('d')
+    lons.frombytes(lon.tobytes())
+    return lats, lons, errors
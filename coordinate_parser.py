@@ -1,10 +1,16 @@
 # -*- coding: utf-8 -*-
 """Coordinate parsing utilities (Phase A)
 DMS / 度分秒 / 方位記号 / 日本語単位混在の正規化を行い 10 進度へ変換。
+classify_format() でサンプル値から列の表記形式を判定し、parser_for() でその形式専用の
+パーサを得る (汎用の DMS_RE → float の順の試行を毎セル行わない)。専用パーサは形式に合わない
+セルだけ parse_dms にフォールバックするため、結果は parse_dms と同じ。
+ParseMemo は同じ座標文字列が繰り返される列 (グリッドに丸めた GPS ログ、毎行同じ拠点など) 向けに、
+パーサの結果を件数上限付きの LRU で保持する。
 """
 from __future__ import annotations
 import re
-from typing import Optional
+import functools
+from typing import Callable, List, Optional, Sequence, Tuple
 
 # 正規表現: 度 分 秒 (任意) + 末尾方位 (N/S/E/W) あるいは東西南北の英字
 DMS_RE = re.compile(r"""^\s*
@@ -15,6 +21,41 @@ DMS_RE = re.compile(r"""^\s*
     \s*(?P<hem>[NnSsEeWw])?\s*$
 """, re.VERBOSE)
 
+# 単純な 10 進数 (符号・小数点のみ。指数表記/方位記号/単位なし)
+PLAIN_DECIMAL_RE = re.compile(r"^[-+]?(?:\d+(?:\.\d*)?|\.\d+)$")
+
+# 形式別の正規表現 (いずれも DMS_RE が受理する表記の部分集合)
+SYMBOL_DMS_RE = re.compile(r"""^\s*
+    (?P<deg>[-+]?\d+(?:\.\d+)?)[°º]\s*
+    (?P<min>\d+(?:\.\d+)?)
+    (?:['’′]\s*(?P<sec>\d+(?:\.\d+)?))?
+    ["”″]?
+    \s*(?P<hem>[NnSsEeWw])?\s*$
+""", re.VERBOSE)
+JA_DMS_RE = re.compile(r"""^\s*
+    (?P<deg>[-+]?\d+(?:\.\d+)?)度\s*
+    (?P<min>\d+(?:\.\d+)?)
+    (?:分\s*(?P<sec>\d+(?:\.\d+)?))?
+    秒?
+    \s*(?P<hem>[NnSsEeWw])?\s*$
+""", re.VERBOSE)
+HEMISPHERE_RE = re.compile(r"^\s*(?P<deg>[-+]?\d+(?:\.\d+)?)\s*(?P<hem>[NnSsEeWw])\s*$")
+# 1 列に "緯度,経度" (または "経度,緯度") を持つ表記。区切りはカンマ/セミコロン
+COMBINED_RE = re.compile(r"^\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+))\s*[,;]\s*([-+]?(?:\d+(?:\.\d*)?|\.\d+))\s*$")
+
+FORMAT_DECIMAL = 'decimal'
+FORMAT_DMS = 'dms'              # 35°39'29.1"N
+FORMAT_DMS_JA = 'dms_ja'        # 35度39分29.1秒
+FORMAT_HEMISPHERE = 'hemisphere'  # 35.658N
+FORMAT_LATLON = 'latlon'        # "35.658,139.708"
+FORMAT_LONLAT = 'lonlat'        # "139.708,35.658"
+FORMAT_GENERIC = 'generic'      # 混在/不明: parse_dms
+COMBINED_FORMATS = (FORMAT_LATLON, FORMAT_LONLAT)
+# 非空サンプルのうちこの割合以上が一致した形式を採用
+FORMAT_RATIO = 0.8
+# ParseMemo の既定の保持件数 (パーサごと)
+DEFAULT_MEMO_SIZE = 65536
+
 HEM_SIGNS = {
     'N': 1, 'n': 1,
     'E': 1, 'e': 1,
@@ -22,17 +63,12 @@ HEM_SIGNS = {
     'W': -1, 'w': -1,
 }
 
-def parse_dms(text: str) -> float:
-    m = DMS_RE.match(text)
-    if not m:
-        # 単純な float として試行
-        try:
-            return float(text.strip())
-        except Exception as e:
-            raise ValueError(f"Cannot parse coordinate: {text}") from e
+def _dms_value(m) -> float:
+    """deg/min/sec/hem グループを持つマッチから 10 進度を計算する。"""
     deg = float(m.group('deg'))
-    minutes = m.group('min')
-    seconds = m.group('sec')
+    groups = m.groupdict()
+    minutes = groups.get('min')
+    seconds = groups.get('sec')
     hem = m.group('hem')
     val = abs(deg)
     if minutes is not None:
@@ -46,15 +82,179 @@ def parse_dms(text: str) -> float:
     return sign * val
 
 
-def parse_lat(text: str) -> float:
-    v = parse_dms(text)
+def parse_dms(text: str) -> float:
+    m = DMS_RE.match(text)
+    if not m:
+        # 単純な float として試行
+        try:
+            return float(text.strip())
+        except Exception as e:
+            raise ValueError(f"Cannot parse coordinate: {text}") from e
+    return _dms_value(m)
+
+
+def parse_decimal(text: str) -> float:
+    """10 進数列用: float を先に試し、失敗したセルのみ parse_dms。"""
+    try:
+        return float(text)
+    except ValueError:
+        return parse_dms(text)
+
+
+def _regex_parser(regex) -> Callable[[str], float]:
+    def parse(text: str) -> float:
+        m = regex.match(text)
+        if m is None:
+            return parse_dms(text)
+        return _dms_value(m)
+    return parse
+
+
+FORMAT_PARSERS = {
+    FORMAT_DECIMAL: parse_decimal,
+    FORMAT_DMS: _regex_parser(SYMBOL_DMS_RE),
+    FORMAT_DMS_JA: _regex_parser(JA_DMS_RE),
+    FORMAT_HEMISPHERE: _regex_parser(HEMISPHERE_RE),
+}
+
+
+def parser_for(fmt: str) -> Callable[[str], float]:
+    """形式に対応するパーサ (結合形式/不明は parse_dms)。"""
+    return FORMAT_PARSERS.get(fmt, parse_dms)
+
+
+# メモ化しない形式 (変換が float() のみ)
+UNMEMOIZED_FORMATS = (FORMAT_DECIMAL,)
+
+
+def _memoize(parse: Callable[[str], float], maxsize: int) -> Callable[[str], float]:
+    """parse の結果を LRU で保持する版。変換できない文字列もエラーメッセージごと保持する。"""
+    @functools.lru_cache(maxsize=maxsize)
+    def cached(text: str) -> Tuple[Optional[float], Optional[str]]:
+        try:
+            return parse(text), None
+        except ValueError as e:
+            return None, str(e)
+
+    def memo(text: str) -> float:
+        value, error = cached(text)
+        if error is not None:
+            raise ValueError(error)
+        return value
+
+    memo.cache_info = cached.cache_info
+    return memo
+
+
+class ParseMemo:
+    """形式別パーサのメモ化。パーサごとに最大 maxsize 件を LRU で保持し、ヒット/ミス数を数える。
+
+    10 進数の列 (FORMAT_DECIMAL) は float() 1 回で済み、LRU の参照の方が重いためメモ化しない。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_MEMO_SIZE):
+        self.maxsize = maxsize
+        self._parsers = {}
+        # 別プロセス (並列パーサのワーカー) で数えた分
+        self._hits = 0
+        self._misses = 0
+
+    def parser(self, fmt: str) -> Callable[[str], float]:
+        if fmt in UNMEMOIZED_FORMATS:
+            return parser_for(fmt)
+        p = self._parsers.get(fmt)
+        if p is None:
+            p = self._parsers[fmt] = _memoize(parser_for(fmt), self.maxsize)
+        return p
+
+    def add_counts(self, hits: int, misses: int) -> None:
+        self._hits += hits
+        self._misses += misses
+
+    @property
+    def hits(self) -> int:
+        return self._hits + sum(p.cache_info().hits for p in self._parsers.values())
+
+    @property
+    def misses(self) -> int:
+        return self._misses + sum(p.cache_info().misses for p in self._parsers.values())
+
+
+def classify_format(values: Sequence[str]) -> str:
+    """サンプル値から列の座標表記形式を判定する。"""
+    values = [v for v in values if v and v.strip()]
+    if not values:
+        return FORMAT_GENERIC
+    need = len(values) * FORMAT_RATIO
+    combined = [COMBINED_RE.match(v) for v in values]
+    if sum(1 for m in combined if m) >= need:
+        firsts = [abs(float(m.group(1))) for m in combined if m]
+        seconds = [abs(float(m.group(2))) for m in combined if m]
+        if any(v > 90 for v in firsts) and all(v <= 90 for v in seconds):
+            return FORMAT_LONLAT
+        return FORMAT_LATLON
+    for fmt, match in (
+        (FORMAT_DECIMAL, lambda v: PLAIN_DECIMAL_RE.match(v.strip())),
+        (FORMAT_DMS, SYMBOL_DMS_RE.match),
+        (FORMAT_DMS_JA, JA_DMS_RE.match),
+        (FORMAT_HEMISPHERE, HEMISPHERE_RE.match),
+    ):
+        if sum(1 for v in values if match(v)) >= need:
+            return fmt
+    return FORMAT_GENERIC
+
+
+def classify_columns(rows: Sequence[Sequence[str]], idx_lat: int, idx_lon: int) -> Tuple[str, str]:
+    """サンプル行から (緯度列の形式, 経度列の形式) を判定する。
+
+    結合形式は緯度と経度に同じ列を指定した場合のみ採用する。
+    """
+    if not rows:
+        return FORMAT_GENERIC, FORMAT_GENERIC
+    lat_fmt = classify_format([r[idx_lat] for r in rows])
+    if idx_lat == idx_lon:
+        return lat_fmt, lat_fmt
+    lon_fmt = classify_format([r[idx_lon] for r in rows])
+    if lat_fmt in COMBINED_FORMATS:
+        lat_fmt = FORMAT_GENERIC
+    if lon_fmt in COMBINED_FORMATS:
+        lon_fmt = FORMAT_GENERIC
+    return lat_fmt, lon_fmt
+
+
+def split_combined(texts: Sequence[str], fmt: str) -> Tuple[List[str], List[str]]:
+    """結合形式の列を (緯度文字列, 経度文字列) の列に分ける。分けられないセルは元の文字列のまま両方に入れる。"""
+    lats: List[str] = []
+    lons: List[str] = []
+    lonlat = fmt == FORMAT_LONLAT
+    for t in texts:
+        m = COMBINED_RE.match(t)
+        if m is None:
+            lats.append(t)
+            lons.append(t)
+        elif lonlat:
+            lats.append(m.group(2))
+            lons.append(m.group(1))
+        else:
+            lats.append(m.group(1))
+            lons.append(m.group(2))
+    return lats, lons
+
+
+def is_plain_decimal(text: str) -> bool:
+    """DMS 等の変換が不要な単純な 10 進数表記か。"""
+    return bool(PLAIN_DECIMAL_RE.match(text))
+
+
+def parse_lat(text: str, parse: Callable[[str], float] = parse_dms) -> float:
+    v = parse(text)
     if not -90 <= v <= 90:
         raise ValueError("Latitude out of range")
     return v
 
 
-def parse_lon(text: str) -> float:
-    v = parse_dms(text)
+def parse_lon(text: str, parse: Callable[[str], float] = parse_dms) -> float:
+    v = parse(text)
     if not -180 <= v <= 180:
         raise ValueError("Longitude out of range")
     return v
@@ -7,14 +7,18 @@ from qgis.PyQt.QtCore import pyqtSignal, Qt, QEvent
 from qgis.PyQt.QtGui import QPalette
 from .settings_store import SettingsStore
 from .provider_registry import get_display_name
-from qgis.PyQt.QtWidgets import QWidget, QComboBox, QButtonGroup, QLabel
+from .csv_source import is_supported_path
+from .layer_output import ATTRIBUTE_INDEX_FORMATS
+from qgis.PyQt.QtWidgets import QWidget, QComboBox, QButtonGroup, QLabel, QHBoxLayout, QLineEdit
 from qgis.PyQt import uic
+from qgis.gui import QgsCheckableComboBox
 import os
 
 
 class CsvDropDockWidget(QWidget):
     fileDropped = pyqtSignal(str)
     openSettings = pyqtSignal()
+    scanCancelRequested = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -23,6 +27,10 @@ class CsvDropDockWidget(QWidget):
         uic.loadUi(ui_path, self)
         # 初期状態管理フラグ
         self._ever_loaded = False  # 一度でもCSVを読み込んだか
+        # バックグラウンド走査 (件数/列統計) の状態
+        self._scan_active = False
+        self._scan_progress = 0
+        self._last_result_meta = {}
         # 初期は解析結果ビューを隠し、案内ラベルを最大化
         try:
             self.result_view.setVisible(False)
@@ -48,6 +56,12 @@ class CsvDropDockWidget(QWidget):
         # コンボボックスのサイズ調整（内容に合わせて自動調整）
         for cb in (self.lat_combo, self.lon_combo, self.addr_combo):
             cb.setSizeAdjustPolicy(QComboBox.AdjustToContents)
+        # 出力列の選択 (列の射影)
+        self._setup_column_selector()
+        # 抽出条件 (読込時の行フィルタ)
+        self._setup_row_filter()
+        # 索引を作るキー列
+        self._setup_index_columns()
         # 排他的ボタングループ
         self._mode_group = QButtonGroup(self)
         self._mode_group.setExclusive(True)
@@ -79,8 +93,8 @@ class CsvDropDockWidget(QWidget):
     def dragEnterEvent(self, event):  # type: ignore
         if event.mimeData().hasUrls():
             for url in event.mimeData().urls():
-                path = url.toLocalFile().lower()
-                if path.endswith(('.csv', '.tsv', '.txt')):
+                path = url.toLocalFile()
+                if is_supported_path(path):
                     event.acceptProposedAction()
                     return
         event.ignore()
@@ -88,12 +102,99 @@ class CsvDropDockWidget(QWidget):
     def dropEvent(self, event):  # type: ignore
         for url in event.mimeData().urls():
             path = url.toLocalFile()
-            lower = path.lower()
-            if lower.endswith(('.csv', '.tsv', '.txt')):
+            if is_supported_path(path):
                 self.fileDropped.emit(path)
                 break
         event.acceptProposedAction()
 
+    def _setup_column_selector(self):
+        """実行ボタンの上に出力列の選択 (チェック式コンボ) を追加する。"""
+        self.columns_label = QLabel(self.tr('出力列：'))
+        self.columns_combo = QgsCheckableComboBox()
+        self.columns_combo.setDefaultText(self.tr('(緯度経度/住所列のみ)'))
+        self.columns_combo.setToolTip(self.tr('レイヤに保持する列。緯度/経度/住所列は常に含まれます。'))
+        row = QHBoxLayout()
+        row.addWidget(self.columns_label)
+        row.addWidget(self.columns_combo, 1)
+        try:
+            lay = self.wdConfig.layout()
+            lay.insertLayout(lay.indexOf(self.build_btn), row)
+        except Exception:
+            pass
+
+    def _setup_row_filter(self):
+        """実行ボタンの上に抽出条件の入力欄を追加する。"""
+        self.filter_label = QLabel(self.tr('抽出条件：'))
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setPlaceholderText(self.tr("(全行)  例: pref = '東京都'"))
+        self.filter_edit.setToolTip(self.tr(
+            '条件に合う行だけを読み込みます (合わない行は地物化・ジオコーディングしません)。\n'
+            "列 演算子 値 (= != < <= > >=) の単純な条件、または QGIS 式 (例: \"address\" <> '' AND \"pop\" > 1000)。\n"
+            '値は文字列として比較し、数値同士なら数値として比較します。'))
+        row = QHBoxLayout()
+        row.addWidget(self.filter_label)
+        row.addWidget(self.filter_edit, 1)
+        try:
+            lay = self.wdConfig.layout()
+            lay.insertLayout(lay.indexOf(self.build_btn), row)
+        except Exception:
+            pass
+
+    def row_filter_text(self) -> str:
+        return self.filter_edit.text().strip()
+
+    def _setup_index_columns(self):
+        """実行ボタンの上に属性インデックスを作る列の選択 (チェック式コンボ) を追加する。"""
+        self.index_label = QLabel(self.tr('索引列：'))
+        self.index_combo = QgsCheckableComboBox()
+        row = QHBoxLayout()
+        row.addWidget(self.index_label)
+        row.addWidget(self.index_combo, 1)
+        try:
+            lay = self.wdConfig.layout()
+            lay.insertLayout(lay.indexOf(self.build_btn), row)
+        except Exception:
+            pass
+        self.update_index_columns_enabled()
+
+    def update_index_columns_enabled(self):
+        """出力形式が属性インデックスに対応する (GeoPackage) 場合のみ索引列を選べるようにする。"""
+        supported = SettingsStore().get_output_format() in ATTRIBUTE_INDEX_FORMATS
+        self.index_label.setEnabled(supported)
+        self.index_combo.setEnabled(supported)
+        if supported:
+            self.index_combo.setDefaultText(self.tr('(空間インデックスのみ)'))
+            self.index_combo.setToolTip(self.tr(
+                '検索・結合のキーにする列。生成後のレイヤにこれらの列の属性インデックスを作成します。\n'
+                '地物数が設定の「索引作成の最小件数」未満のレイヤでは作成しません。'))
+        else:
+            self.index_combo.setDefaultText(self.tr('(GeoPackage 出力のみ)'))
+            self.index_combo.setToolTip(self.tr(
+                '属性インデックスは出力形式が GeoPackage の場合のみ作成できます (設定の「処理」タブ)。\n'
+                'メモリ / FlatGeobuf 出力では空間インデックスのみ作成します。'))
+
+    def index_columns(self):
+        """属性インデックスを作る列名のリスト (未選択、または出力形式が非対応なら空)。"""
+        if not self.index_combo.isEnabled():
+            return []
+        return list(self.index_combo.checkedItems())
+
+    def _fill_columns(self, header):
+        self.columns_combo.clear()
+        self.columns_combo.addItems(list(header))
+        for i in range(self.columns_combo.count()):
+            self.columns_combo.setItemCheckState(i, Qt.Checked)
+        self.index_combo.clear()
+        self.index_combo.addItems(list(header))
+
+    def selected_columns(self):
+        """チェックされた列名のリスト。全列が選択されている場合は None (射影なし)。"""
+        checked = list(self.columns_combo.checkedItems())
+        if len(checked) == self.columns_combo.count():
+            return None
+        return checked
+
     def _setup_settings_links(self):
         self._settings_link_labels = []
         for name in ('geocode_setting_link', 'coords_setting_link'):
@@ -129,36 +230,7 @@ class CsvDropDockWidget(QWidget):
         if 'error' in meta and not meta.get('header'):
             self.result_view.setPlainText(self.tr('エラー: {err}').format(err=meta.get('error')))
             return
-        order = [
-            ('file_name', self.tr('ファイル名')),
-            ('record_count', self.tr('件数')),
-            ('encoding', self.tr('エンコーディング')),
-            ('delimiter', self.tr('区切り文字')),
-            ('header', self.tr('フィールド')),
-            ('lat_field_auto', self.tr('緯度フィールド（自動判定）')),
-            ('lon_field_auto', self.tr('経度フィールド（自動判定）')),
-            ('address_field_auto', self.tr('住所フィールド（自動判定）')),
-            ('lat_candidates', self.tr('緯度フィールド候補')),
-            ('lon_candidates', self.tr('経度フィールド候補')),
-            ('address_candidates', self.tr('住所フィールド候補')),
-        ]
-        lines = []
-        for key, label in order:
-            if key in meta:
-                val = meta.get(key)
-                # 文字列化時に改行や制御文字を除去 (単行表示)
-                sval = str(val).replace('\r','').replace('\n',' ')
-                lines.append(f"- {label}: {sval}")
-        # 連続する空行を削除
-        cleaned = []
-        prev_blank = False
-        for ln in lines:
-            blank = (ln.strip()=='' )
-            if blank and prev_blank:
-                continue
-            cleaned.append(ln)
-            prev_blank = blank
-        self.result_view.setPlainText("\n".join(cleaned))
+        self._render_result(meta)
         # Esc ヒントラベルを表示
         if hasattr(self, 'esc_hint_label') and self.esc_hint_label:
             self.esc_hint_label.setText(self.tr('(別ファイルはこのパネルへドロップできます / Escキーで初期化)'))
@@ -200,6 +272,7 @@ class CsvDropDockWidget(QWidget):
         refill(self.lat_combo, header)
         refill(self.lon_combo, header)
         refill(self.addr_combo, header)
+        self._fill_columns(header)
         if meta.get('lat_field_auto'):
             self.lat_combo.setCurrentText(meta['lat_field_auto'])
         if meta.get('lon_field_auto'):
@@ -208,6 +281,79 @@ class CsvDropDockWidget(QWidget):
             self.addr_combo.setCurrentText(meta['address_field_auto'])
         self._update_mode_enable(has_latlon, has_address)
 
+    def updateResult(self, meta: dict):
+        """バックグラウンド走査の途中/完了結果で解析結果テキストのみ更新する (コンボは維持)。"""
+        if not self._ever_loaded:
+            return
+        self._render_result(meta)
+
+    def _render_result(self, meta: dict):
+        self._last_result_meta = dict(meta)
+        order = [
+            ('file_name', self.tr('ファイル名')),
+            ('record_count', self.tr('件数')),
+            ('encoding', self.tr('エンコーディング')),
+            ('encoding_error', self.tr('デコードエラー')),
+            ('encoding_suggested', self.tr('エンコーディング候補')),
+            ('delimiter', self.tr('区切り文字')),
+            ('header', self.tr('フィールド')),
+            ('lat_field_auto', self.tr('緯度フィールド（自動判定）')),
+            ('lon_field_auto', self.tr('経度フィールド（自動判定）')),
+            ('address_field_auto', self.tr('住所フィールド（自動判定）')),
+            ('lat_candidates', self.tr('緯度フィールド候補')),
+            ('lon_candidates', self.tr('経度フィールド候補')),
+            ('address_candidates', self.tr('住所フィールド候補')),
+            ('column_stats', self.tr('列プロファイル')),
+        ]
+        lines = []
+        for key, label in order:
+            if key == 'record_count':
+                lines.append(f"- {label}: {self._format_record_count(meta)}")
+                continue
+            if key == 'column_stats' and key in meta:
+                lines.append(f"- {label}: {self._format_column_stats(meta.get(key))}")
+                continue
+            if key in meta:
+                val = meta.get(key)
+                # 文字列化時に改行や制御文字を除去 (単行表示)
+                sval = str(val).replace('\r','').replace('\n',' ')
+                lines.append(f"- {label}: {sval}")
+        # 連続する空行を削除
+        cleaned = []
+        prev_blank = False
+        for ln in lines:
+            blank = (ln.strip()=='' )
+            if blank and prev_blank:
+                continue
+            cleaned.append(ln)
+            prev_blank = blank
+        self.result_view.setPlainText("\n".join(cleaned))
+
+    def _format_record_count(self, meta: dict) -> str:
+        # 推定値 (record_count_approx) は正確な件数で置き換わるまで「約」を付けて表示
+        count = meta.get('record_count')
+        if count is None:
+            text = ''
+        elif meta.get('record_count_approx'):
+            text = self.tr('約 {count} (推定)').format(count=f'{count:,}')
+        else:
+            text = f'{count:,}'
+        if meta.get('record_count_approx') or count is None:
+            if self._scan_active:
+                text += ' ' + self.tr('集計中… {pct}%').format(pct=self._scan_progress)
+            elif meta.get('scan_canceled'):
+                text += ' ' + self.tr('集計中止')
+        return text.strip()
+
+    def _format_column_stats(self, stats) -> str:
+        parts = []
+        for st in stats or []:
+            try:
+                parts.append(self.tr('{name}(非空 {non_empty} / 最大 {max_length}文字)').format(**st))
+            except Exception:
+                continue
+        return ', '.join(parts)
+
     def _update_mode_enable(self, has_latlon: bool, has_address: bool):
         coords_active = (self.mode_stack.currentIndex() == 0)
         geocode_active = (self.mode_stack.currentIndex() == 1)
@@ -448,14 +594,20 @@ class CsvDropDockWidget(QWidget):
             pass
 
     # 進捗バー関連のヘルパ
-    def start_progress(self):
+    def start_progress(self, cancelable: bool = True):
         self.progress_bar.setValue(0)
         self.progress_bar.setVisible(True)
-        self.cancel_btn.setVisible(True)
-        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setVisible(cancelable)
+        self.cancel_btn.setEnabled(cancelable)
 
-    def update_progress(self, val: float):
-        self.progress_bar.setValue(int(val))
+    def update_progress(self, val: float, repaint: bool = False):
+        """repaint=True はイベントループを回さずにその場で再描画する (同期処理中の進捗用)。"""
+        pct = int(val)
+        if pct == self.progress_bar.value():
+            return
+        self.progress_bar.setValue(pct)
+        if repaint:
+            self.progress_bar.repaint()
 
     def finish_progress(self):
         self.progress_bar.setValue(100)
@@ -463,10 +615,32 @@ class CsvDropDockWidget(QWidget):
         self.progress_bar.setVisible(False)
         self.cancel_btn.setVisible(False)
 
-    # Esc キーで初期化
+    # バックグラウンド走査 (件数/列統計) の表示ヘルパ
+    def start_scan(self):
+        self._scan_active = True
+        self._scan_progress = 0
+
+    def update_scan_progress(self, val: float):
+        pct = int(val)
+        if not self._scan_active or pct == self._scan_progress:
+            return
+        self._scan_progress = pct
+        self.updateResult(self._last_result_meta)
+
+    def finish_scan(self):
+        self._scan_active = False
+
+    def is_scan_active(self) -> bool:
+        return self._scan_active
+
+    # Esc キーで初期化 (走査中は走査のキャンセルのみ)
     def keyPressEvent(self, e):  # type: ignore
         try:
             if e.key() == Qt.Key_Escape:
+                if self._scan_active:
+                    self.scanCancelRequested.emit()
+                    e.accept()
+                    return
                 if self._ever_loaded and not self.progress_bar.isVisible():
                     self.reset()
                     e.accept()
@@ -477,6 +651,8 @@ class CsvDropDockWidget(QWidget):
 
     # レイヤ生成後に UI を初期化
     def reset(self):
+        self._scan_active = False
+        self._last_result_meta = {}
         self.result_view.clear()
         self.result_view.setPlaceholderText(self.tr('解析結果: まだファイルがドロップされていません'))
         # 初期状態では結果ビュー非表示 / 案内ラベル再表示
@@ -490,6 +666,9 @@ class CsvDropDockWidget(QWidget):
             cb.clear()
             cb.addItem('')
             cb.blockSignals(False)
+        self.columns_combo.clear()
+        self.filter_edit.clear()
+        self.index_combo.clear()
         self._set_mode(0)
         self.build_btn.setEnabled(False)
         self.build_btn.setText(self.tr('実行 (条件不足)'))
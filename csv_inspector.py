@@ -1,79 +1,320 @@
 # -*- coding: utf-8 -*-
 """CSV 基本解析 (Phase 1)
-- エンコーディング推定 (BOM -> chardet -> fallback)
-- 区切り推定 (csv.Sniffer)
+- エンコーディング推定 (BOM -> ASCII/UTF-8 -> chardet 逐次投入 -> fallback。encoding_detector 参照)
+- 区切り推定 (候補ごとの出現数の一貫性。delimiter_detector 参照)
 - ヘッダ抽出
+- 単一パスのストリーミング走査 (件数 + 列統計)
+- 件数のみの高速カウント (mmap + bytes.count、不可なら csv.reader)
+- 先頭サンプルの平均行長による件数の即時推定
+- 圧縮ファイル (.gz/.bz2/.xz/.zip/.zst) は csv_source で展開しながら読む
+- 走査中のデコード検証 (途中で不正バイトがあれば位置と代替エンコーディング候補を報告)
+- 走査と同じパスでの列型の検証 (サンプルから推定した型を全行で確認し、合わない列は広げる)
 この段階では外部依存を避け、chardet が無ければスキップ。
 """
 from __future__ import annotations
 import os
+import io
+import re
 import csv
 import codecs
 import sys
 import json
-from typing import Dict, List, Optional
+from typing import Callable, Iterator, List, Optional
+from .record_counter import count_records as fast_count_records, estimate_records
+from .encoding_detector import TieredEncodingDetector
+from .delimiter_detector import detect_delimiter
+from .csv_source import is_plain, open_binary
+from .type_inference import TypeValidator
 
-try:
-    import chardet  # type: ignore
-except ImportError:  # pragma: no cover
-    chardet = None  # fallback later
+# 行分割: \n / \r\n / 単独 \r (csv.reader に newline='' 相当の行を渡すため)
+_LINE_SPLIT_RE = re.compile(r'(?<=\n)|(?<=\r)(?!\n)')
 
-BOM_TABLE = [
-    (codecs.BOM_UTF8, 'utf-8-sig'),
-    (codecs.BOM_UTF16_LE, 'utf-16-le'),
-    (codecs.BOM_UTF16_BE, 'utf-16-be'),
-]
 
 class CsvBasicMeta(dict):
     """Simple dict subclass for clarity."""
     pass
 
+
+class ChunkedLineReader:
+    """バイナリストリームを一度だけ読み、デコード済みの行を返すイテレータ。
+
+    先頭サンプル (判定に使用済みのバイト列) を再読込せずにそのまま先頭として扱う。
+    ``bytes_read`` で読込済みバイト数を参照でき、``should_stop`` が True を返すと
+    チャンク境界で読込を打ち切る (キャンセル用)。
+    ``validate`` が True の場合はまず strict でデコードし、最初の不正バイトの位置を
+    ``decode_error`` (offset, reason) と ``decode_error_bytes`` に記録してから errors へ切り替える。
+    ``on_chunk`` を渡すと読み込んだバイトチャンク (先頭サンプルを含む) を順に渡す (行索引の作成用)。
+    """
+    ERROR_SAMPLE_SIZE = 65536
+
+    def __init__(self, stream, encoding: str, head: bytes = b'', chunk_size: int = 1 << 20,
+                 errors: str = 'replace', should_stop: Optional[Callable[[], bool]] = None,
+                 validate: bool = False, on_chunk: Optional[Callable[[bytes], None]] = None):
+        self.stream = stream
+        self.encoding = encoding
+        self.head = head
+        self.chunk_size = chunk_size
+        self.errors = errors
+        self.should_stop = should_stop
+        self.validate = validate
+        self.on_chunk = on_chunk
+        self.bytes_read = 0
+        self.stopped = False
+        self.decode_error = None
+        self.decode_error_bytes = b''
+
+    def _chunks(self) -> Iterator[bytes]:
+        if self.head:
+            self.bytes_read += len(self.head)
+            if self.on_chunk:
+                self.on_chunk(self.head)
+            yield self.head
+        while True:
+            if self.should_stop and self.should_stop():
+                self.stopped = True
+                return
+            chunk = self.stream.read(self.chunk_size)
+            if not chunk:
+                return
+            self.bytes_read += len(chunk)
+            if self.on_chunk:
+                self.on_chunk(chunk)
+            yield chunk
+
+    def _decode_checked(self, decoder, chunk: bytes, final: bool = False):
+        """strict でデコードし、失敗時は記録して errors 指定のデコーダへ切り替える。"""
+        state = decoder.getstate()
+        try:
+            return decoder, decoder.decode(chunk, final)
+        except UnicodeDecodeError as e:
+            chunk_start = self.bytes_read - len(chunk)
+            carried = max(0, len(e.object) - len(chunk))
+            start = max(0, e.start - carried)
+            self.decode_error = (chunk_start + start, e.reason)
+            self.decode_error_bytes = chunk[start:start + self.ERROR_SAMPLE_SIZE]
+            decoder = codecs.getincrementaldecoder(self.encoding)(self.errors)
+            decoder.setstate(state)
+            return decoder, decoder.decode(chunk, final)
+
+    def __iter__(self) -> Iterator[str]:
+        checking = self.validate
+        decoder = codecs.getincrementaldecoder(self.encoding)('strict' if checking else self.errors)
+        pending = ''
+        for chunk in self._chunks():
+            if checking:
+                decoder, decoded = self._decode_checked(decoder, chunk)
+                checking = self.decode_error is None
+            else:
+                decoded = decoder.decode(chunk)
+            text = pending + decoded
+            # 末尾 \r は次チャンク先頭の \n と対になる可能性があるため保留
+            if text.endswith('\r'):
+                pending = '\r'
+                text = text[:-1]
+            else:
+                pending = ''
+            parts = _LINE_SPLIT_RE.split(text)
+            pending = parts.pop() + pending
+            yield from parts
+        if checking:
+            decoder, decoded = self._decode_checked(decoder, b'', final=True)
+        else:
+            decoded = decoder.decode(b'', final=True)
+        pending += decoded
+        if pending:
+            yield pending
+
+
 class CsvInspector:
     SAMPLE_SIZE = 65536
+    CHUNK_SIZE = 1 << 20
+    # 列統計の更新間隔 (行) ごとにキャンセル/進捗を確認
+    FEEDBACK_INTERVAL = 8192
+
+    def __init__(self):
+        self.encoding_detector = TieredEncodingDetector()
 
     def detect_encoding(self, path: str) -> str:
-        with open(path, 'rb') as f:
+        with open_binary(path) as f:
             raw = f.read(self.SAMPLE_SIZE)
-        for bom, name in BOM_TABLE:
-            if raw.startswith(bom):
-                return name
-        if chardet:
-            res = chardet.detect(raw)
-            enc = res.get('encoding') or ''
-            conf = res.get('confidence') or 0
-            if enc and conf >= 0.5:
-                return enc
-        # heuristic fallback tries
-        for cand in ('utf-8', 'cp932'):
-            try:
-                raw.decode(cand)
-                return cand
-            except Exception:
-                continue
-        return 'utf-8'
+            enc, _ = self._detect(path, raw, f)
+        return enc
+
+    def _detect(self, path: str, raw: bytes, src):
+        # 追加サンプルのシーク読みは非圧縮ファイルのみ (圧縮ストリームは先頭サンプルで判定)
+        if is_plain(path):
+            return self.encoding_detector.detect(raw, src.raw, os.path.getsize(path))
+        return self.encoding_detector.detect(raw)
+
+    def detect_encoding_bytes(self, raw: bytes) -> str:
+        enc, _ = self.encoding_detector.detect(raw)
+        return enc
 
     def sniff(self, text: str) -> str:
+        return self.sniff_with_confidence(text)[0]
+
+    def sniff_with_confidence(self, text: str):
+        """(区切り文字, 信頼度) を返す。"""
         try:
-            dialect = csv.Sniffer().sniff(text)
-            return dialect.delimiter
+            return detect_delimiter(text)
         except Exception:
-            return ','
+            return ',', 0.0
+
+    def _decode_sample(self, raw: bytes, enc: str) -> str:
+        # サンプル末尾で多バイト文字が途切れても落ちないよう incremental で decode
+        return codecs.getincrementaldecoder(enc)('replace').decode(raw)
 
     def inspect(self, path: str) -> CsvBasicMeta:
-        enc = self.detect_encoding(path)
-        with open(path, 'r', encoding=enc, errors='replace') as f:
-            sample = f.read(self.SAMPLE_SIZE)
-        delimiter = self.sniff(sample)
-        # Re-read first line for header
-        with open(path, 'r', encoding=enc, errors='replace', newline='') as f:
-            reader = csv.reader(f, delimiter=delimiter)
+        """先頭サンプルのみを 1 回読み、エンコーディング/区切り/ヘッダを返す。
+
+        record_count はサンプルから推定した件数で、record_count_approx が True の間は概算値。
+        """
+        with open_binary(path) as f:
+            raw = f.read(self.SAMPLE_SIZE)
+            enc, _ = self._detect(path, raw, f)
+        sample = self._decode_sample(raw, enc)
+        delimiter, confidence = self.sniff_with_confidence(sample)
+        reader = csv.reader(io.StringIO(sample, newline=''), delimiter=delimiter)
+        header: List[str] = next(reader, [])
+        meta = CsvBasicMeta(encoding=enc, delimiter=delimiter, delimiter_confidence=confidence, header=header)
+        # 圧縮ファイルは展開後サイズが不明なため推定しない
+        estimate, approx = estimate_records(raw, os.path.getsize(path), enc) if is_plain(path) else (None, True)
+        if estimate is not None:
+            meta['record_count'] = estimate
+            meta['record_count_approx'] = approx
+        return meta
+
+    def count_records(self, path: str, encoding: str, delimiter: str = ',', feedback=None) -> Optional[int]:
+        """ヘッダを除くレコード数。mmap による高速カウントを優先し、不可の場合のみ csv.reader で数える。
+        キャンセル時は None。
+        """
+        should_stop = feedback.isCanceled if feedback is not None else None
+        progress = feedback.setProgress if feedback is not None else None
+        n = fast_count_records(path, encoding, should_stop=should_stop, progress=progress)
+        if n is not None or (should_stop and should_stop()):
+            return n
+        with open_binary(path) as f:
+            lines = ChunkedLineReader(f, encoding, chunk_size=self.CHUNK_SIZE, should_stop=should_stop)
+            reader = csv.reader(lines, delimiter=delimiter)
+            next(reader, None)  # skip header
+            n = sum(1 for _ in reader)
+        return None if lines.stopped else n
+
+    def decodes_cleanly(self, path: str, encoding: str, feedback=None) -> Optional[bool]:
+        """ファイル全体を encoding で strict にデコードできるか。キャンセル時は None。"""
+        decoder = codecs.getincrementaldecoder(encoding)('strict')
+        with open_binary(path) as f:
+            while True:
+                if feedback is not None and feedback.isCanceled():
+                    return None
+                chunk = f.read(self.CHUNK_SIZE)
+                try:
+                    decoder.decode(chunk, final=not chunk)
+                except UnicodeDecodeError:
+                    return False
+                if not chunk:
+                    return True
+
+    def validate_types(self, path: str, encoding: str, delimiter: str, column_types, feedback=None) -> Optional[List[str]]:
+        """全行を読んで column_types (ヘッダ順) を検証し、合わない値のある列を広げた型を返す。
+        文字列以外の列が無ければ読まずにそのまま返す。キャンセル時は None。
+        """
+        validate = TypeValidator(column_types)
+        if not validate:
+            return validate.types
+        size = os.path.getsize(path)
+        should_stop = feedback.isCanceled if feedback is not None else None
+        with open_binary(path) as f:
+            lines = ChunkedLineReader(f, encoding, chunk_size=self.CHUNK_SIZE, should_stop=should_stop)
+            reader = csv.reader(lines, delimiter=delimiter)
+            next(reader, None)  # skip header
+            for n, row in enumerate(reader, 1):
+                validate(row)
+                if feedback is not None and n % self.FEEDBACK_INTERVAL == 0 and size:
+                    feedback.setProgress(min(100.0, f.position() / size * 100.0))
+        return None if lines.stopped else validate.types
+
+    def scan(self, path: str, feedback=None, column_types=None, index=None) -> CsvBasicMeta:
+        """ファイルを 1 回だけ先頭から読み、解析結果をまとめて返す。
+
+        encoding / delimiter / header に加え record_count (ヘッダ除く行数) と
+        column_stats (列ごとの非空件数・最大文字数) を含む。
+        column_types (サンプルからの推定型) を渡すと全行で検証し、column_types (検証済み) を含む。
+        推定エンコーディングで途中にデコードできないバイトがあった場合は encoding_error
+        (バイト位置と理由) と、判別できれば encoding_suggested を含む。
+        feedback は isCanceled() / setProgress(float) を持つオブジェクト (QgsTask 等)。
+        キャンセル時は 'canceled': True を含む途中結果を返す。
+        index (RowIndexBuilder) を渡すと、読み込んだバイト列から同じパスで行オフセット索引を作る。
+        """
+        size = os.path.getsize(path)
+        should_stop = feedback.isCanceled if feedback is not None else None
+        with open_binary(path) as f:
+            raw = f.read(self.SAMPLE_SIZE)
+            enc, _ = self._detect(path, raw, f)
+            delimiter, confidence = self.sniff_with_confidence(self._decode_sample(raw, enc))
+            lines = ChunkedLineReader(f, enc, head=raw, chunk_size=self.CHUNK_SIZE,
+                                      should_stop=should_stop, validate=True,
+                                      on_chunk=index.feed if index is not None else None)
+            reader = csv.reader(lines, delimiter=delimiter)
             header: List[str] = next(reader, [])
-        meta = CsvBasicMeta(encoding=enc, delimiter=delimiter, header=header[:50])
+            ncol = len(header)
+            non_empty = [0] * ncol
+            max_len = [0] * ncol
+            row_count = 0
+            validate = TypeValidator(column_types) if column_types and len(column_types) == ncol else None
+            for row in reader:
+                row_count += 1
+                if validate:
+                    validate(row)
+                for i, val in enumerate(row[:ncol]):
+                    if val:
+                        non_empty[i] += 1
+                        n = len(val)
+                        if n > max_len[i]:
+                            max_len[i] = n
+                if feedback is not None and row_count % self.FEEDBACK_INTERVAL == 0 and size:
+                    feedback.setProgress(min(100.0, f.position() / size * 100.0))
+        column_stats = [
+            {'name': name, 'non_empty': non_empty[i], 'max_length': max_len[i]}
+            for i, name in enumerate(header)
+        ]
+        meta = CsvBasicMeta(
+            encoding=enc,
+            delimiter=delimiter,
+            delimiter_confidence=confidence,
+            header=header,
+            record_count=row_count,
+            column_stats=column_stats,
+        )
+        if validate is not None and not lines.stopped:
+            meta['column_types'] = validate.types
+        if lines.decode_error is not None:
+            offset, reason = lines.decode_error
+            meta['encoding_error'] = f'byte {offset}: {reason}'
+            suggested = self._suggest_encoding(lines.decode_error_bytes, enc)
+            if suggested:
+                meta['encoding_suggested'] = suggested
+        if lines.stopped:
+            meta['canceled'] = True
         return meta
 
+    def _suggest_encoding(self, raw: bytes, current: str) -> Optional[str]:
+        """デコード失敗箇所のバイト列から代替エンコーディングを推定する。
+        ASCII 互換で失敗箇所を strict にデコードできる場合のみ採用。
+        """
+        enc, conf = self.encoding_detector.detect(raw)
+        if not enc or codecs.lookup(enc).name == codecs.lookup(current).name:
+            return None
+        try:
+            codecs.getincrementaldecoder(enc)('strict').decode(raw, final=False)
+            b'",\r\n'.decode(enc)
+        except (UnicodeDecodeError, LookupError):
+            return None
+        return enc
+
 # Simple manual test when run standalone
 if __name__ == '__main__':  # pragma: no cover
     insp = CsvInspector()
     for p in sys.argv[1:]:
         print(p)
-        print(json.dumps(insp.inspect(p), ensure_ascii=False, indent=2))
+        print(json.dumps(insp.scan(p), ensure_ascii=False, indent=2))
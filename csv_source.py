@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""CSV 入力ソース (圧縮ファイルのストリーミング展開)
+.gz / .bz2 / .xz / .zip / .zst をディスクへ展開せずに先頭から逐次読み込む。
+- 解析 (CsvInspector)・件数カウント・レイヤ生成・ジオコーディングで共通に使用
+- .zst は zstandard モジュールがある場合のみ対応
+- .zip はアーカイブ内の最初の CSV/TSV/TXT (無ければ最初のファイル) を読む
+"""
+from __future__ import annotations
+import io
+import os
+import bz2
+import gzip
+import lzma
+import zipfile
+from typing import Optional
+
+try:
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+TEXT_EXTENSIONS = ('.csv', '.tsv', '.txt')
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gzip',
+    '.bz2': 'bz2',
+    '.xz': 'xz',
+    '.zip': 'zip',
+    '.zst': 'zstd',
+}
+
+
+def compression_of(path: str) -> Optional[str]:
+    ext = os.path.splitext(path)[1].lower()
+    return COMPRESSION_EXTENSIONS.get(ext)
+
+
+def is_supported_path(path: str) -> bool:
+    """ドロップ可能なファイルか (.csv 等、またはその圧縮形式 / .zip)。"""
+    lower = path.lower()
+    comp = compression_of(lower)
+    if comp == 'zip':
+        return True
+    if comp == 'zstd' and zstandard is None:
+        return False
+    if comp:
+        lower = os.path.splitext(lower)[0]
+    return lower.endswith(TEXT_EXTENSIONS)
+
+
+def is_plain(path: str) -> bool:
+    """非圧縮 (シーク/mmap 可能) なファイルか。"""
+    return compression_of(path) is None
+
+
+class SourceStream:
+    """展開済みバイト列を read() で返すストリーム。
+
+    position() は元ファイル (圧縮データ) の読込位置で、進捗計算に使う。
+    """
+
+    def __init__(self, stream, raw):
+        self.stream = stream
+        self.raw = raw
+
+    def read(self, size: int = -1) -> bytes:
+        return self.stream.read(size)
+
+    def position(self) -> int:
+        try:
+            return self.raw.tell()
+        except (OSError, ValueError):
+            return 0
+
+    def close(self) -> None:
+        for obj in (self.stream, self.raw):
+            try:
+                obj.close()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def _open_zip_member(raw):
+    zf = zipfile.ZipFile(raw)
+    names = [i.filename for i in zf.infolist() if not i.is_dir()]
+    if not names:
+        raise ValueError('ZIP アーカイブにファイルがありません')
+    member = next((n for n in names if n.lower().endswith(TEXT_EXTENSIONS)), names[0])
+    return zf.open(member)
+
+
+def open_binary(path: str) -> SourceStream:
+    """展開済みバイト列を読むストリームを返す (非圧縮ならファイルそのもの)。"""
+    raw = open(path, 'rb')
+    try:
+        comp = compression_of(path)
+        if comp is None:
+            stream = raw
+        elif comp == 'gzip':
+            stream = gzip.GzipFile(fileobj=raw, mode='rb')
+        elif comp == 'bz2':
+            stream = bz2.BZ2File(raw, mode='rb')
+        elif comp == 'xz':
+            stream = lzma.LZMAFile(raw, mode='rb')
+        elif comp == 'zip':
+            stream = _open_zip_member(raw)
+        elif zstandard is not None:
+            stream = zstandard.ZstdDecompressor().stream_reader(raw)
+        else:
+            raise ValueError('.zst の読込には zstandard モジュールが必要です')
+    except Exception:
+        raw.close()
+        raise
+    return SourceStream(stream, raw)
+
+
+def open_text(path: str, encoding: str, errors: str = 'replace'):
+    """csv.reader 向けのテキストストリーム (newline='')。"""
+    if is_plain(path):
+        return open(path, 'r', encoding=encoding, errors=errors, newline='')
+    src = open_binary(path)
+    return io.TextIOWrapper(io.BufferedReader(_Readable(src)), encoding=encoding, errors=errors, newline='')
+
+
+class _Readable(io.RawIOBase):
+    """SourceStream を io.BufferedReader に渡すためのアダプタ。"""
+
+    def __init__(self, src: SourceStream):
+        self._src = src
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self._src.read(len(b))
+        n = len(data)
+        b[:n] = data
+        return n
+
+    def close(self) -> None:
+        self._src.close()
+        super().close()
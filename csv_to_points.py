@@ -33,10 +33,23 @@ from .csv_to_points_dialog import CsvToPointsPluginDialog
 from .csv_dock_widget import CsvDropDockWidget
 from .csv_inspector import CsvInspector
 from .field_detector import FieldDetector
-from .point_layer_builder import PointLayerBuilder
+from .point_layer_builder import (
+    PointLayerBuilder, ExtentTracker, projection_indices, row_projector, iter_batches, field_type,
+)
+from .layer_output import OutputTarget
+from .layer_indexer import build_indexes
+from .geometry_factory import point_geometries
 from .settings_dialog import SettingsDialog
 from .nominatim_geocoder import NominatimGeocoder
 from .geocode_task import GeocodeTask
+from .inspect_task import InspectTask, ValidateTypesTask
+from .inspection_cache import InspectionCache
+from .csv_source import open_text
+from .parallel_parser import default_workers
+from .row_sampler import sample_rows, QUICK_SAMPLE_SIZE, QUICK_STREAM_LIMIT
+from .type_inference import infer_column_types, RowConverter, TYPE_STRING
+from .value_interner import ValueInterner, low_cardinality_columns
+from .row_filter import compile_filter
 from .google_geocoder import GoogleGeocoder
 from .mapbox_geocoder import MapboxGeocoder
 from .opencage_geocoder import OpenCageGeocoder
@@ -45,13 +58,12 @@ from .yahoojp_geocoder import YahooJapanGeocoder
 from .settings_store import SettingsStore
 from qgis.core import (
     QgsProject,
-    QgsVectorLayer,
     QgsFields,
     QgsField,
-    QgsGeometry,
-    QgsPointXY,
     QgsFeature,
     QgsApplication,
+    QgsMessageLog,
+    Qgis,
 )
 from qgis.PyQt.QtCore import QVariant
 import csv
@@ -104,8 +116,16 @@ class CsvToPointsPlugin:
         self.field_detector = FieldDetector()
         self.layer_builder = PointLayerBuilder()
         self._last_meta = None  # 最新解析結果を保持
+        self._row_index = None  # 最新ファイルの行オフセット索引 (row_index.RowIndex)
+        self._sample_rows = []  # 最新ファイルのサンプル行 (row_sampler)
         self._active_task = None
         self._pending_layer = None
+        self._inspect_task = None
+        # 全体走査前にビルドした場合の列型検証タスク
+        self._validate_task = None
+        # 解析結果のディスクキャッシュ (QGIS 再起動後も有効)
+        self.inspect_cache = InspectionCache(
+            os.path.join(QgsApplication.qgisSettingsDirPath(), 'csv_to_points', 'inspect_cache'))
 
     # noinspection PyMethodMayBeStatic
     def tr(self, message):
@@ -230,6 +250,7 @@ class CsvToPointsPlugin:
         self.drop_panel.fileDropped.connect(self.on_file_dropped)
         self.drop_panel.build_btn.clicked.connect(self.on_build_points)
         self.drop_panel.openSettings.connect(self.on_open_settings)
+        self.drop_panel.scanCancelRequested.connect(self._cancel_inspect_task)
         # ラッパとして QDialog を用意（将来 Dock にも差し替え可能な構成）
         dlg = QDialog(self.iface.mainWindow())
         dlg.setObjectName('CsvToPointsWindow')
@@ -242,11 +263,34 @@ class CsvToPointsPlugin:
         self.window = dlg
 
     def on_file_dropped(self, path: str):
+        # 前回ファイルの走査が残っていれば中止
+        self._cancel_inspect_task()
         meta = {}
+        self._row_index = None
+        self._sample_rows = []
+        cache_key = self.inspect_cache.key_for(path)
+        cached = self.inspect_cache.get(cache_key)
         try:
-            meta = self.inspector.inspect(path)
+            if cached and 'header' in cached and cached.get('record_count') is not None:
+                # 未変更ファイルの再ドロップ: 走査をスキップ
+                meta = dict(cached)
+                index = self.inspect_cache.get_index(cache_key)
+                if index is not None and index.record_count == meta['record_count']:
+                    self._row_index = index
+            else:
+                # ヘッダ/フィールド判定は先頭サンプルのみで即時表示し、件数/列統計は後から反映
+                meta = self.inspector.inspect(path)
+                cached = None
             header = meta.get('header') or []
-            fd = self.field_detector.detect(header)
+            # 内容ベースの判定用のデータ行サンプル。行索引があればシークで一様に取る。
+            # 無ければ GUI スレッドを止めないよう少数行に抑え、一様サンプルは全体走査のタスクで取り直す
+            if self._row_index is not None:
+                self._sample_rows = sample_rows(path, meta.get('encoding', 'utf-8'), meta.get('delimiter', ','),
+                                                header, row_index=self._row_index)
+            else:
+                self._sample_rows = sample_rows(path, meta.get('encoding', 'utf-8'), meta.get('delimiter', ','),
+                                                header, k=QUICK_SAMPLE_SIZE, stream_limit=QUICK_STREAM_LIMIT)
+            fd = self.field_detector.detect(header, self._sample_rows)
             meta.update({
                 'lat_field_auto': fd.get('chosen_lat'),
                 'lon_field_auto': fd.get('chosen_lon'),
@@ -255,25 +299,94 @@ class CsvToPointsPlugin:
                 'lon_candidates': fd.get('lon_candidates'),
                 'address_candidates': fd.get('address_candidates'),
             })
-            # 追加: 行数カウント (ヘッダ除く) & ファイル名
-            try:
-                row_count = 0
-                with open(path, 'r', encoding=meta.get('encoding','utf-8'), errors='replace', newline='') as fcsv:
-                    reader = csv.reader(fcsv, delimiter=meta.get('delimiter',','))
-                    next(reader, None)  # skip header
-                    for _ in reader:
-                        row_count += 1
-                meta['record_count'] = row_count
-            except Exception:
-                pass
+            # 値の種類が少ない列 (ビルド時にインターン)。キャッシュ済みなら前回の全体走査時 (一様サンプル) の判定を使う
+            if 'low_cardinality' not in meta:
+                meta['low_cardinality'] = low_cardinality_columns(header, self._sample_rows)
             meta['file_name'] = os.path.basename(path)
         except Exception as e:  # collect error only
             meta = {'error': str(e)}
+        self._last_meta = {'path': path, 'cache_key': cache_key, **meta}
+        if 'error' not in meta and not cached:
+            self._start_inspect_task(path, meta.get('encoding', 'utf-8'), meta.get('delimiter', ','), meta.get('header'),
+                                     infer_column_types(meta.get('header') or [], self._sample_rows))
         self.drop_panel.showResult(meta)
-        self._last_meta = {'path': path, **meta}
+
+    def _start_inspect_task(self, path: str, encoding: str, delimiter: str, header=None, column_types=None):
+        """件数/列統計の全体走査 (と列型の検証・一様サンプル) をバックグラウンドで開始する。"""
+        task = InspectTask('Inspecting CSV', path, self.inspector, encoding, delimiter,
+                           lambda ok, meta: self._on_inspect_finished(task, ok, meta), header, column_types)
+        self._inspect_task = task
+        self.drop_panel.start_scan()
+        try:
+            task.progressChanged.connect(lambda val: self.drop_panel.update_scan_progress(val))
+            QgsApplication.taskManager().addTask(task)
+        except Exception:
+            self._inspect_task = None
+            self.drop_panel.finish_scan()
+
+    def _on_inspect_finished(self, task, ok: bool, meta: dict):
+        # 別ファイルのドロップ/初期化後に完了した古いタスクは無視
+        if task is not self._inspect_task:
+            return
+        self._inspect_task = None
+        self.drop_panel.finish_scan()
+        if not self._last_meta or self._last_meta.get('path') != task.path:
+            return
+        if ok:
+            self._last_meta['record_count'] = meta.get('record_count')
+            self._last_meta.pop('record_count_approx', None)
+            self._last_meta['column_stats'] = meta.get('column_stats')
+            if meta.get('column_types'):
+                self._last_meta['column_types'] = meta['column_types']
+            if task.sample_rows:
+                # 即時判定の少数行サンプルを一様サンプルで置き換える (型推定・座標形式・インターン用)
+                self._sample_rows = task.sample_rows
+                self._last_meta['low_cardinality'] = meta.get('low_cardinality')
+            if meta.get('encoding_error'):
+                self._report_encoding_error(meta)
+            if task.row_index is not None:
+                self._row_index = task.row_index
+                self.inspect_cache.put_index(self._last_meta.get('cache_key'), task.row_index)
+            self.inspect_cache.put(self._last_meta.get('cache_key'), meta)
+        else:
+            self._last_meta['scan_canceled'] = True
+        self.drop_panel.updateResult(self._last_meta)
+
+    def _report_encoding_error(self, meta: dict):
+        """走査中にデコードできないバイトを検出した場合の通知。
+
+        代替候補でファイル全体をデコードできると確認済みの場合のみ以降の読込に採用し、
+        それ以外は現在のエンコーディングのまま候補を表示する (置換文字で読み込む)。
+        """
+        current = self._last_meta.get('encoding')
+        suggested = meta.get('encoding_suggested')
+        self._last_meta['encoding_error'] = meta['encoding_error']
+        if suggested and meta.get('encoding_suggested_verified'):
+            meta['encoding'] = suggested
+            self._last_meta['encoding'] = suggested
+            self.iface.messageBar().pushInfo('CSV to Points', self.tr('{old} でデコードできないバイトがあるため、エンコーディングを {new} に切り替えました').format(old=current, new=suggested))
+        elif suggested:
+            self._last_meta['encoding_suggested'] = suggested
+            self.iface.messageBar().pushWarning('CSV to Points', self.tr('{old} でデコードできないバイトがあります ({err})。エンコーディングは {new} の可能性があります').format(old=current, err=meta['encoding_error'], new=suggested))
+        else:
+            self.iface.messageBar().pushWarning('CSV to Points', self.tr('{old} でデコードできないバイトがあります ({err})。該当箇所は置換文字で読み込みます').format(old=current, err=meta['encoding_error']))
+
+    def _cancel_inspect_task(self):
+        task = self._inspect_task
+        self._inspect_task = None
+        if task is None:
+            return
+        try:
+            task.cancel()
+        except Exception:
+            pass
+        self.drop_panel.finish_scan()
+        if self._last_meta:
+            self._last_meta['scan_canceled'] = True
+            self.drop_panel.updateResult(self._last_meta)
 
     def on_build_points(self):
-        if not self._last_meta:
+        if not self._last_meta or self._validate_task is not None:
             return
         m = self._last_meta
         header = m.get('header') or []
@@ -287,24 +400,62 @@ class CsvToPointsPlugin:
         # ユーザがジオコーディングモードを選択している場合は
         # 緯度経度列が存在しても geocoding を実行する (従来は lat/lon 優先でスキップしていた)
         creating_from_latlon = bool(lat and lon) and not want_geocode
+        # 出力先 (メモリ / GeoPackage)
+        output = OutputTarget(store.get_output_format(), store.get_output_dir())
+        # 列型: 全体走査で検証済みの型。走査が済んでいなければ全行の検証をタスクで行い、完了後にビルドし直す
+        column_types = m.get('column_types')
+        if not column_types or len(column_types) != len(header):
+            self._start_validate_task(m, header)
+            return
+        # 抽出条件は読込ループ内で評価 (条件外の行は地物化・ジオコーディングしない)
+        try:
+            row_filter = compile_filter(self.drop_panel.row_filter_text(), header)
+        except ValueError as e:
+            self.iface.messageBar().pushCritical('CSV to Points', self.tr('抽出条件が不正です: {err}').format(err=e))
+            return
+        # 最終段で作る索引 (キー列の属性インデックスと、最小件数)
+        index_columns = self.drop_panel.index_columns() if output.supports_attribute_index else []
+        index_min = store.get_index_min_features()
 
         if creating_from_latlon:
+            self.drop_panel.start_progress(cancelable=False)
             try:
-                layer = self.layer_builder.build_memory_layer(
+                layer = self.layer_builder.build_layer(
                     csv_path=m['path'],
                     encoding=m.get('encoding','utf-8'),
                     delimiter=m.get('delimiter',','),
                     header=header,
                     lat_field=lat,
                     lon_field=lon,
-                    layer_name=os.path.basename(m['path'])+' (pts)'
+                    layer_name=os.path.basename(m['path'])+' (pts)',
+                    columns=self.drop_panel.selected_columns(),
+                    workers=store.get_parallel_workers() or default_workers(),
+                    row_index=self._row_index,
+                    total=m.get('record_count'),
+                    progress=self._on_build_progress,
+                    output=output,
+                    sample_rows=self._sample_rows,
+                    column_types=column_types,
+                    intern_columns=m.get('low_cardinality'),
+                    row_filter=row_filter,
+                    memo_size=store.get_parse_cache_size(),
+                    complete_coordinates=self._coordinates_complete(m, lat, lon),
                 )
+                self._build_indexes(layer, index_columns, index_min)
                 QgsProject.instance().addMapLayer(layer)
                 self.iface.messageBar().pushSuccess('CSV to Points', self.tr('レイヤ追加: {count} 件 (lat/lon)').format(count=layer.featureCount()))
+                self._warn_type_mismatches(self.layer_builder.type_mismatches)
+                b = self.layer_builder
+                if b.parse_cache_hits or b.parse_cache_misses:
+                    QgsMessageLog.logMessage(
+                        f'座標キャッシュ: ヒット {b.parse_cache_hits} / ミス {b.parse_cache_misses}',
+                        'CSV to Points', Qgis.Info)
                 # ここに来るのは want_geocode=False の場合のみ (上で creating_from_latlon 定義変更済)
                 self._clear_after_build(async_in_progress=False)
             except Exception as e:
                 self.iface.messageBar().pushCritical('CSV to Points', self.tr('レイヤ生成失敗: {err}').format(err=e))
+            finally:
+                self.drop_panel.finish_progress()
             return
     # 依存インポートはモジュール先頭へ移動済み
         # Qt5 向け: 非推奨コンストラクタを避け、QVariant 型を明示
@@ -325,46 +476,91 @@ class CsvToPointsPlugin:
                 return f
         sync_threshold = store.get_sync_threshold()
         force_sync = store.get_sync_all()
-        rows = []
-        try:
-            with open(m['path'], 'r', encoding=m.get('encoding','utf-8'), errors='replace', newline='') as fcsv:
+        # 選択列 (+ 住所列) のみを保持
+        keep_idx = projection_indices(header, self.drop_panel.selected_columns(), (addr_field,))
+        out_header = [header[i] for i in keep_idx]
+        # 住所列はジオコーダへ文字列で渡すため型推定の対象外
+        out_types = [TYPE_STRING if header[i] == addr_field else column_types[i] for i in keep_idx]
+        convert = RowConverter(out_types, out_header)
+        low_card = set(m.get('low_cardinality') or ())
+        intern = ValueInterner([n for n, col in enumerate(out_header)
+                                if col in low_card and out_types[n] == TYPE_STRING])
+
+        ncols = len(header)
+        project = row_projector(keep_idx, ncols)
+
+        def _iter_rows():
+            """CSV を先頭から逐次読み、抽出条件に合う行を選択列のみ (型変換済み) で返す (全行をメモリに溜めない)。"""
+            with open_text(m['path'], m.get('encoding','utf-8')) as fcsv:
                 reader = csv.reader(fcsv, delimiter=m.get('delimiter', ','))
                 next(reader, None)
                 for row in reader:
-                    if len(row) < len(header):
-                        row = row + [''] * (len(header)-len(row))
-                    rows.append(row)
+                    if len(row) < ncols:
+                        row.extend([''] * (ncols - len(row)))
+                    if row_filter is not None and not row_filter(row):
+                        continue
+                    out = project(row)
+                    if convert:
+                        convert(out)
+                    if intern:
+                        intern(out)
+                    yield out
+
+        def _scanned(done: int) -> int:
+            """進捗用の読込済み行数 (フィルタ時は条件外の行も含む)。"""
+            return row_filter.seen if row_filter is not None else done
+        try:
+            # 読込可否だけ先に確認 (本体はバッチ単位で逐次読込)
+            with open_text(m['path'], m.get('encoding','utf-8')) as fcsv:
+                fcsv.read(1)
         except Exception as e:
             self.iface.messageBar().pushCritical('CSV to Points', self.tr('CSV読込失敗: {err}').format(err=e))
             return
+        # 件数は走査済みの値 (未完了ならサンプルからの推定値) を優先し、無い場合のみ実件数
+        record_count = m.get('record_count')
+        if record_count is None:
+            record_count = self.inspector.count_records(m['path'], m.get('encoding','utf-8'), m.get('delimiter', ',')) or 0
         if not addr_field or addr_field not in header:
-            layer = QgsVectorLayer('Point?crs=EPSG:4326', os.path.basename(m['path'])+' (attr)', 'memory')
-            pr = layer.dataProvider()
             flds = QgsFields()
-            for col in header:
-                flds.append(_mk_field(col, QVariant.String))
-            pr.addAttributes(flds)
-            layer.updateFields()
-            for row in rows:
-                feat = QgsFeature(layer.fields())
-                feat.setAttributes(row)
-                pr.addFeatures([feat])
+            for col, t in zip(out_header, out_types):
+                flds.append(_mk_field(col, field_type(t)))
+            self.drop_panel.start_progress(cancelable=False)
+            try:
+                sink = output.open_sink(m['path'], os.path.basename(m['path'])+' (attr)', flds)
+                done = 0
+                template = QgsFeature(sink.fields)
+                for batch in iter_batches(_iter_rows(), output.batch_size):
+                    feats = []
+                    for row in batch:
+                        feat = QgsFeature(template)
+                        feat.setAttributes(row)
+                        feats.append(feat)
+                    sink.add(feats)
+                    done += len(feats)
+                    self._on_build_progress(_scanned(done) / max(record_count, 1) * 100.0)
+                layer = sink.finish()
+            except Exception as e:
+                self.iface.messageBar().pushCritical('CSV to Points', self.tr('レイヤ生成失敗: {err}').format(err=e))
+                return
+            finally:
+                self.drop_panel.finish_progress()
+            self._build_indexes(layer, index_columns, index_min)
             QgsProject.instance().addMapLayer(layer)
             self.iface.messageBar().pushWarning('CSV to Points', self.tr('住所フィールドが無いためポイント空ジオメトリ (属性のみ) を追加しました'))
+            self._warn_type_mismatches(convert.mismatches)
             self._clear_after_build(async_in_progress=False)
             return
 
-        do_sync = want_geocode and (force_sync or len(rows) <= sync_threshold)
+        # 同期/非同期の判定は抽出条件を適用する前の件数で行う (条件に合う件数は読み込むまで分からない)
+        do_sync = want_geocode and (force_sync or record_count <= sync_threshold)
         layer_name = os.path.basename(m['path']) + (' (addr-sync)' if do_sync else ' (addr)')
-        layer = QgsVectorLayer('Point?crs=EPSG:4326', layer_name, 'memory')
-        pr = layer.dataProvider()
         flds = QgsFields()
-        for col in header:
-            flds.append(_mk_field(col, QVariant.String))
+        for col, t in zip(out_header, out_types):
+            flds.append(_mk_field(col, field_type(t)))
         if want_geocode:
             # プロバイダ別の型付きフィールドを追加（QVariant 型指定）
             def _add(name: str, qvar_type):
-                if layer.fields().indexFromName(name) < 0:
+                if flds.indexFromName(name) < 0:
                     flds.append(_mk_field(name, qvar_type))
             if provider == 'google':
                 # lat/lng は Double, partial_match は Bool
@@ -437,9 +633,13 @@ class CsvToPointsPlugin:
                     ('AddressMatchingLevel', QVariant.Int),  # 整数に変更
                 ]:
                     _add(cname, mtype)
-        pr.addAttributes(flds)
-        layer.updateFields()
-        addr_idx = header.index(addr_field)
+        try:
+            # 非同期ジオコーディングは完成後のレイヤを書き換えるため更新可能な出力先が必要
+            sink = output.open_sink(m['path'], layer_name, flds, updatable=want_geocode and not do_sync)
+        except Exception as e:
+            self.iface.messageBar().pushCritical('CSV to Points', self.tr('レイヤ生成失敗: {err}').format(err=e))
+            return
+        addr_idx = out_header.index(addr_field)
 
         if do_sync and want_geocode:
             if provider == 'google':
@@ -465,16 +665,31 @@ class CsvToPointsPlugin:
                 rate_interval = 1.0
             added = failed = 0
             google_extra = provider == 'google'
-            for r in rows:
-                feat = QgsFeature(layer.fields())
+            template = QgsFeature(sink.fields)
+            extent = ExtentTracker()
+            feats = []
+            # 座標を得た地物と座標 (形状は追加時にバッチ単位で一括生成)
+            located = []
+            xs = []
+            ys = []
+
+            def _flush():
+                for f, g in zip(located, point_geometries(xs, ys)):
+                    f.setGeometry(g)
+                extent.add_all(xs, ys)
+                sink.add(feats)
+                del feats[:], located[:], xs[:], ys[:]
+
+            for r in _iter_rows():
+                feat = QgsFeature(template)
                 status = error = precision = ''
-                geom = None
+                point = None
                 gdict = { 'status':'', 'error':'', 'location_type':'', 'formatted_address':'', 'place_id':'', 'types':'', 'postal_code':'','lat':'','lng':'','partial_match':'', }
                 addr_val = (r[addr_idx] or '').strip()
                 if do_sync and addr_val:
                     res = geocoder.geocode(addr_val)
                     if res.status == 'OK' and res.lat is not None and res.lon is not None:
-                        geom = QgsGeometry.fromPointXY(QgsPointXY(res.lon, res.lat))
+                        point = (res.lon, res.lat)
                         status = 'OK'
                         precision = res.precision or ''
                         if google_extra and isinstance(getattr(res,'raw',None), dict):
@@ -513,7 +728,7 @@ class CsvToPointsPlugin:
                         failed += 1
                     if rate_interval>0:
                         time.sleep(rate_interval)
-                attrs = list(r)
+                attrs = r
                 if want_geocode:
                     if google_extra:
                         gdict['status'] = status
@@ -585,36 +800,53 @@ class CsvToPointsPlugin:
                         else:
                             attrs += [status, error, None, None, None, None, None]
                 feat.setAttributes(attrs)
-                if geom:
-                    feat.setGeometry(geom)
-                pr.addFeatures([feat])
-            layer.updateExtents()
+                if point:
+                    located.append(feat)
+                    xs.append(point[0])
+                    ys.append(point[1])
+                feats.append(feat)
+                if len(feats) >= output.batch_size:
+                    _flush()
+            if feats:
+                _flush()
+            layer = sink.finish()
+            extent.apply(layer)
+            self._build_indexes(layer, index_columns, index_min)
             if do_sync:
                 self.iface.messageBar().pushSuccess('CSV to Points', self.tr('同期ジオコーディング完了({provider}): 成功 {added} / 失敗 {failed}').format(provider=provider, added=added, failed=failed))
             QgsProject.instance().addMapLayer(layer)
             self.iface.messageBar().pushSuccess('CSV to Points', self.tr('レイヤ追加: {count} 件 (住所同期)').format(count=layer.featureCount()))
+            self._warn_type_mismatches(convert.mismatches)
             self._clear_after_build(async_in_progress=False)
             return
 
-        for r in rows:
-            feat = QgsFeature(layer.fields())
-            attrs = list(r)
-            if want_geocode:
-                if provider == 'google':
-                    attrs += [None]*10
-                elif provider == 'nominatim':
-                    attrs += [None]*7
-                elif provider == 'mapbox':
-                    attrs += [None]*8
-                elif provider == 'opencage':
-                    attrs += [None]*7
-                elif provider == 'here':
-                    attrs += [None]*7
-                elif provider == 'yahoojp':
-                    attrs += [None]*7
-            feat.setAttributes(attrs)
-            pr.addFeatures([feat])
+        self.drop_panel.start_progress(cancelable=False)
+        try:
+            done = 0
+            # ジオコーディング結果列の空値 (行ごとに分岐/生成しない)
+            pad = [None] * (len(sink.fields) - len(out_header)) if want_geocode else []
+            template = QgsFeature(sink.fields)
+            for batch in iter_batches(_iter_rows(), output.batch_size):
+                feats = []
+                for r in batch:
+                    feat = QgsFeature(template)
+                    if pad:
+                        r.extend(pad)
+                    feat.setAttributes(r)
+                    feats.append(feat)
+                sink.add(feats)
+                done += len(feats)
+                self._on_build_progress(_scanned(done) / max(record_count, 1) * 100.0)
+            layer = sink.finish()
+        except Exception as e:
+            self.iface.messageBar().pushCritical('CSV to Points', self.tr('レイヤ生成失敗: {err}').format(err=e))
+            return
+        finally:
+            self.drop_panel.finish_progress()
         layer.updateExtents()
+        # ジオコーディング結果の形状は書込時にプロバイダが索引へ反映する
+        self._build_indexes(layer, index_columns, index_min)
+        self._warn_type_mismatches(convert.mismatches)
         if want_geocode:
             if provider == 'google':
                 geocoder = GoogleGeocoder()
@@ -647,6 +879,68 @@ class CsvToPointsPlugin:
             self.iface.messageBar().pushSuccess('CSV to Points', self.tr('レイヤ追加: {count} 件 (住所のみ)').format(count=layer.featureCount()))
             self._clear_after_build(async_in_progress=False)
 
+    @staticmethod
+    def _coordinates_complete(m: dict, lat: str, lon: str) -> bool:
+        """全体走査の列統計で、緯度/経度列に空値が無い (非空件数 = 件数) と確認できるか。"""
+        stats = m.get('column_stats')
+        count = m.get('record_count')
+        if not stats or count is None or m.get('record_count_approx') or m.get('scan_canceled'):
+            return False
+        non_empty = {s.get('name'): s.get('non_empty') for s in stats}
+        return non_empty.get(lat) == count and non_empty.get(lon) == count
+
+    def _start_validate_task(self, m: dict, header):
+        """サンプルから推定した列型の全行検証をバックグラウンドで開始する (完了後に on_build_points を再実行)。"""
+        sampled = infer_column_types(header, self._sample_rows)
+        task = ValidateTypesTask('Validating CSV column types', m['path'], self.inspector,
+                                 m.get('encoding', 'utf-8'), m.get('delimiter', ','), sampled,
+                                 lambda ok, types: self._on_validate_finished(task, m, ok, types))
+        self._validate_task = task
+        self.drop_panel.start_progress()
+        try:
+            task.progressChanged.connect(lambda val: self.drop_panel.update_progress(val))
+            self.drop_panel.cancel_btn.clicked.connect(task.cancel)
+            QgsApplication.taskManager().addTask(task)
+        except Exception:
+            self._validate_task = None
+            self.drop_panel.finish_progress()
+
+    def _on_validate_finished(self, task, m: dict, ok: bool, types):
+        if task is not self._validate_task:
+            return
+        self._validate_task = None
+        self.drop_panel.finish_progress()
+        # キャンセル、または検証中に別ファイルがドロップされた/初期化された場合はビルドしない
+        if task.isCanceled() or m is not self._last_meta:
+            return
+        # 検証できなければ値を失わないよう全列文字列
+        m['column_types'] = types if ok and types else [TYPE_STRING] * len(m.get('header') or [])
+        self.on_build_points()
+
+    def _warn_type_mismatches(self, count: int):
+        """推定型に変換できず NULL にした値があれば警告する。"""
+        if count:
+            self.iface.messageBar().pushWarning('CSV to Points', self.tr('推定した列型に変換できない値 {count} 件を NULL にしました').format(count=count))
+
+    def _build_indexes(self, layer, key_columns, min_features: int):
+        """生成レイヤに空間インデックスとキー列の属性インデックスを作り、所要時間をログに残す。"""
+        try:
+            report = build_indexes(layer, key_columns, min_features)
+        except Exception as e:
+            QgsMessageLog.logMessage(f'索引作成に失敗しました: {e}', 'CSV to Points', Qgis.Warning)
+            return
+        if report or report.failed or (report.skipped and key_columns):
+            QgsMessageLog.logMessage(report.message(), 'CSV to Points',
+                                     Qgis.Warning if report.failed else Qgis.Info)
+
+    def _on_build_progress(self, val: float):
+        """同期ビルドのバッチごとの進捗。進捗バーだけをその場で再描画する。
+
+        イベントループは回さない (走査タスクの完了通知等がビルド途中に割り込み、
+        _last_meta / _sample_rows の差し替えやパネルの初期化が起きるため)。
+        """
+        self.drop_panel.update_progress(min(100.0, val), repaint=True)
+
     def _on_geocode_finished(self, ok: bool, added: int, failed: int, processed: int, layer):
         try:
             if ok and layer and layer.id() not in QgsProject.instance().mapLayers():
@@ -666,6 +960,9 @@ class CsvToPointsPlugin:
         if async_in_progress:
             return
         self._last_meta = None
+        self._row_index = None
+        self._sample_rows = []
+        self._cancel_inspect_task()
         try:
             self.drop_panel.reset()
         except Exception:
@@ -681,6 +978,8 @@ class CsvToPointsPlugin:
                 # プロバイダ一覧を即時更新
                 try:
                     self.drop_panel._populate_providers()
+                    # 出力形式に応じて索引列の選択可否を更新
+                    self.drop_panel.update_index_columns_enabled()
                     # 解析結果が残っていれば Build ボタン有効性を再評価
                     if self._last_meta:
                         meta = self._last_meta
@@ -695,6 +994,13 @@ class CsvToPointsPlugin:
 
     def unload(self):
         """Removes the plugin menu item and icon from QGIS GUI."""
+        self._cancel_inspect_task()
+        if self._validate_task is not None:
+            try:
+                self._validate_task.cancel()
+            except Exception:
+                pass
+            self._validate_task = None
         for action in self.actions:
             self.iface.removePluginMenu(
                 self.tr(u'&CSV to Points'),
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""区切り文字推定 (csv.Sniffer の代替)
+候補 (, / タブ / ; / |) ごとに 1 レコードあたりの出現数を数え、レコード間で最も
+一定している候補を採用する。
+- クォート内の文字は数えない (クォート内改行を含むレコードは 1 レコードとして結合)
+- サンプル長に対して線形時間 (行ごとに str.count のみ。クォート状態は行単位で反転)
+- 信頼度 = 最頻出現数を持つレコードの割合 (0.0-1.0)
+"""
+from __future__ import annotations
+import re
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+CANDIDATES = (',', '\t', ';', '|')
+DEFAULT_DELIMITER = ','
+
+_QUOTED_RE = re.compile(r'"(?:[^"]|"")*"')
+
+
+def _logical_records(text: str, max_records: int) -> List[str]:
+    """クォート内改行を考慮して行を結合し、クォート部分を除いたレコード列を返す。"""
+    lines = text.splitlines()
+    # サンプル末尾で途切れた行は除外
+    if len(lines) > 1 and not text.endswith(('\n', '\r')):
+        lines.pop()
+    records: List[str] = []
+    parts: List[str] = []
+    in_quotes = False
+    for ln in lines:
+        parts.append(ln)
+        # 各行のクォート数だけで状態を反転する (結合済みの部分を数え直さない)
+        if ln.count('"') % 2:
+            in_quotes = not in_quotes
+        if in_quotes:
+            continue  # クォートが閉じていない → 次の行と結合
+        buf = '\n'.join(parts) if len(parts) > 1 else ln
+        parts = []
+        records.append(_QUOTED_RE.sub('', buf) if '"' in buf else buf)
+        if len(records) >= max_records:
+            break
+    return [r for r in records if r]
+
+
+def detect_delimiter(text: str, candidates: Iterable[str] = CANDIDATES, max_records: int = 2000) -> Tuple[str, float]:
+    """(区切り文字, 信頼度) を返す。判定不能な場合は (',', 0.0)。"""
+    records = _logical_records(text, max_records)
+    if not records:
+        return DEFAULT_DELIMITER, 0.0
+    best = (DEFAULT_DELIMITER, 0.0, 0)
+    for cand in candidates:
+        counts = Counter(r.count(cand) for r in records)
+        mode, freq = counts.most_common(1)[0]
+        if mode == 0:
+            continue
+        consistency = freq / len(records)
+        # 一貫性が同等なら 1 レコードあたりの出現数が多い候補を優先
+        if (consistency, mode) > (best[1], best[2]):
+            best = (cand, consistency, mode)
+    return best[0], round(best[1], 3)
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""段階的エンコーディング推定
+1. BOM
+2. ASCII / UTF-8 の妥当性チェック (bytes.isascii / strict decode。C 実装で高速)
+   - 先頭が ASCII のみの場合は、ファイル中盤・末尾のサンプルも確認し
+     後半にだけ現れる Shift_JIS 等の多バイト文字を拾う
+3. chardet.UniversalDetector へチャンクを逐次投入し、確定 (done) した時点で打ち切り
+4. utf-8 / cp932 の試行フォールバック
+chardet が無い環境では 3 をスキップする。
+"""
+from __future__ import annotations
+import os
+import codecs
+from typing import Optional, Tuple
+
+try:
+    from chardet.universaldetector import UniversalDetector  # type: ignore
+except ImportError:  # pragma: no cover
+    UniversalDetector = None
+
+BOM_TABLE = [
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be'),
+]
+
+FALLBACK_CANDIDATES = ('utf-8', 'cp932')
+
+
+def _is_valid_utf8(raw: bytes) -> bool:
+    # 末尾で多バイト文字が途切れていても不正とはみなさない
+    try:
+        codecs.getincrementaldecoder('utf-8')('strict').decode(raw, final=False)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _align_block(block: bytes) -> bytes:
+    """ファイル途中から読んだブロックを行頭にそろえる。
+
+    任意のバイト位置から読むと多バイト文字の途中で始まるため、最初の改行の直後から使う
+    (UTF-8 / Shift_JIS とも 0x0A は多バイト文字の一部にならない)。
+    改行が無いブロックは UTF-8 の継続バイト (0x80-0xBF) だけを読み飛ばす。
+    """
+    nl = block.find(b'\n')
+    if 0 <= nl < len(block) - 1:
+        return block[nl + 1:]
+    i = 0
+    while i < len(block) and 0x80 <= block[i] <= 0xBF:
+        i += 1
+    return block[i:]
+
+
+class TieredEncodingDetector:
+    PROBE_SIZE = 65536
+    # 先頭が ASCII のみのときに追加で確認するファイル内位置 (割合)
+    PROBE_POINTS = (0.25, 0.5, 0.75, 1.0)
+    FEED_SIZE = 16384
+    MAX_FEED = 1 << 20
+    MIN_CONFIDENCE = 0.5
+
+    def detect(self, head: bytes, f=None, size: Optional[int] = None) -> Tuple[str, float]:
+        """(エンコーディング名, 信頼度) を返す。
+
+        f にシーク可能なバイナリファイルを渡すと、追加のサンプルを読む。
+        f の読込位置は呼び出し前の位置に戻す。
+        """
+        for bom, name in BOM_TABLE:
+            if head.startswith(bom):
+                return name, 1.0
+        pos = f.tell() if f is not None else None
+        try:
+            raw = head
+            if head.isascii() and f is not None:
+                raw = self._probe_non_ascii(f, size, len(head))
+                if raw is None:
+                    return 'utf-8', 1.0
+            if _is_valid_utf8(raw):
+                return 'utf-8', 0.99
+            enc, conf = self._detect_incremental(raw, f)
+            if enc and conf >= self.MIN_CONFIDENCE:
+                return enc, conf
+        finally:
+            if pos is not None:
+                f.seek(pos)
+        for cand in FALLBACK_CANDIDATES:
+            try:
+                raw.decode(cand)
+                return cand, 0.0
+            except UnicodeDecodeError:
+                continue
+        return 'utf-8', 0.0
+
+    def _probe_non_ascii(self, f, size: Optional[int], skip: int) -> Optional[bytes]:
+        """ファイル中盤以降のサンプルから非 ASCII を含む最初のブロックを返す。無ければ None。"""
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        if size <= skip:
+            return None
+        for ratio in self.PROBE_POINTS:
+            start = max(skip, min(int(size * ratio), size - self.PROBE_SIZE))
+            f.seek(start)
+            block = _align_block(f.read(self.PROBE_SIZE))
+            if block and not block.isascii():
+                return block
+        return None
+
+    def _detect_incremental(self, raw: bytes, f=None) -> Tuple[Optional[str], float]:
+        if UniversalDetector is None:
+            return None, 0.0
+        det = UniversalDetector()
+        fed = 0
+        for i in range(0, len(raw), self.FEED_SIZE):
+            det.feed(raw[i:i + self.FEED_SIZE])
+            fed += self.FEED_SIZE
+            if det.done:
+                break
+        # サンプルだけで確定しない場合は続きのバイトを上限まで投入
+        while not det.done and f is not None and fed < self.MAX_FEED:
+            chunk = f.read(self.FEED_SIZE)
+            if not chunk:
+                break
+            det.feed(chunk)
+            fed += len(chunk)
+        det.close()
+        res = det.result or {}
+        return res.get('encoding'), res.get('confidence') or 0.0
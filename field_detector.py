@@ -5,10 +5,13 @@
 - 経度 (lon) 候補
 - 住所 (address) 候補
 スコアリングで最上位をプリセット決定。
+サンプル行 (row_sampler) を渡すと、値が座標として解釈できるかで候補を補正する。
+座標列が見つからず "緯度,経度" を 1 列に持つ列があれば、その列を緯度/経度の両方に選ぶ。
 """
 from __future__ import annotations
-from typing import List, Dict
+from typing import List, Dict, Optional, Sequence
 from .settings_store import SettingsStore
+from .coordinate_parser import parse_lat, parse_lon, classify_format, COMBINED_FORMATS
 import re
 
 # デフォルト(グローバル) キーワード: 常に利用。ユーザ入力欄には表示しない。
@@ -28,6 +31,12 @@ PAIR_X_NAMES = {"x", "fx", "lon", "lng", "経度"}
 PAIR_Y_NAMES = {"y", "fy", "lat", "緯度"}
 
 NORMALIZE_RE = re.compile(r"[\s_]+")
+INT_RE = re.compile(r"^[+-]?\d+$")
+
+# 内容判定: 非空値のうちこの割合以上が座標として解釈できれば座標列とみなす
+COORD_RATIO = 0.9
+# 名前は一致するが値が座標として解釈できない列の減点
+CONTENT_PENALTY = 40
 
 
 def normalize(name: str) -> str:
@@ -81,7 +90,70 @@ def _merged_keywords() -> Dict[str, List[str]]:
     }
 
 
-def detect(header: List[str]) -> Dict[str, object]:
+def profile_columns(header: Sequence[str], rows: Sequence[Sequence[str]]) -> List[Dict[str, float]]:
+    """列ごとに非空件数と、緯度/経度として解釈できた割合、整数値の割合を返す。"""
+    profiles = []
+    for i in range(len(header)):
+        values = [r[i].strip() for r in rows if i < len(r) and r[i].strip()]
+        n_lat = n_lon = n_int = 0
+        for v in values:
+            if INT_RE.match(v):
+                n_int += 1
+            try:
+                parse_lat(v)
+                n_lat += 1
+            except Exception:
+                pass
+            try:
+                parse_lon(v)
+                n_lon += 1
+            except Exception:
+                pass
+        n = len(values)
+        profiles.append({
+            'non_empty': n,
+            'lat_ratio': n_lat / n if n else 0.0,
+            'lon_ratio': n_lon / n if n else 0.0,
+            'int_ratio': n_int / n if n else 0.0,
+        })
+    return profiles
+
+
+def _apply_content(header: Sequence[str], profiles: List[Dict[str, float]], lat_candidates: list, lon_candidates: list) -> None:
+    """サンプル値で候補スコアを補正する (名前一致でも値が座標でなければ減点、名前不明なら値から補完)。
+
+    値だけで補完するのは、もう一方の軸に名前の手掛かりがある場合か、緯度・経度の両方が
+    値から見つかる場合のみ (片方だけ値で選ぶと無関係な数値列を誤って選びやすい)。
+    """
+    prof = dict(zip(header, profiles))
+    for cands, key in ((lat_candidates, 'lat_ratio'), (lon_candidates, 'lon_ratio')):
+        for i, (f, sc) in enumerate(cands):
+            p = prof.get(f)
+            if p and p['non_empty'] and p[key] < COORD_RATIO:
+                cands[i] = (f, max(1, sc - CONTENT_PENALTY))
+    if lat_candidates and lon_candidates:
+        return
+    # ID 等の整数列は座標とみなさない
+    coord_cols = [f for f in header
+                  if prof[f]['non_empty'] and prof[f]['lon_ratio'] >= COORD_RATIO and prof[f]['int_ratio'] < COORD_RATIO]
+    # 緯度範囲に収まる列と、収まらない (経度のみ) 列に分ける
+    lat_like = [f for f in coord_cols if prof[f]['lat_ratio'] >= COORD_RATIO]
+    lon_only = [f for f in coord_cols if f not in lat_like]
+    pick_lat = lat_like[0] if not lat_candidates and lat_like else None
+    pick_lon = None
+    if not lon_candidates:
+        taken = {c[0] for c in lat_candidates} | {pick_lat}
+        rest = lon_only or [f for f in lat_like if f not in taken]
+        pick_lon = rest[0] if rest else None
+    if not lat_candidates and not lon_candidates and not (pick_lat and pick_lon):
+        return
+    if pick_lat:
+        lat_candidates.append((pick_lat, 30))
+    if pick_lon:
+        lon_candidates.append((pick_lon, 30))
+
+
+def detect(header: List[str], rows: Optional[Sequence[Sequence[str]]] = None) -> Dict[str, object]:
     kw = _merged_keywords()
     lat_candidates = []  # (field, score)
     lon_candidates = []
@@ -110,6 +182,15 @@ def detect(header: List[str]) -> Dict[str, object]:
                 if k in norm_set and all(normalize(c[0]) != k for c in lon_candidates):
                     lon_candidates.append((norm_set[k], 50))
 
+    if rows:
+        _apply_content(header, profile_columns(header, rows), lat_candidates, lon_candidates)
+        if not lat_candidates and not lon_candidates:
+            for i, f in enumerate(header):
+                if classify_format([r[i] for r in rows if i < len(r)]) in COMBINED_FORMATS:
+                    lat_candidates.append((f, 30))
+                    lon_candidates.append((f, 30))
+                    break
+
     # ソート
     lat_candidates.sort(key=lambda x: x[1], reverse=True)
     lon_candidates.sort(key=lambda x: x[1], reverse=True)
@@ -130,8 +211,8 @@ def detect(header: List[str]) -> Dict[str, object]:
 
 
 class FieldDetector:
-    def detect(self, header: List[str]) -> Dict[str, object]:
-        return detect(header)
+    def detect(self, header: List[str], rows: Optional[Sequence[Sequence[str]]] = None) -> Dict[str, object]:
+        return detect(header, rows)
 
 
 if __name__ == "__main__":  # pragma: no cover
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""ポイント形状の一括生成 (WKB)
+行ごとに QgsGeometry.fromPointXY(QgsPointXY(x, y)) を呼ぶと、1 点ごとに Python ⇔ C++ のラッパーを
+複数作ることになる。バッチ内の座標配列から MultiPoint の WKB を 1 つ組み立て、
+fromWkb → asGeometryCollection の 1 回の呼出しで各点の QgsGeometry を得る。
+- WKB は NumPy があれば構造化配列で一括生成し、無ければ struct でまとめて pack する
+- 分解結果の件数が合わない場合 (想定外) は 1 点ずつの生成にフォールバック
+"""
+from __future__ import annotations
+import struct
+from typing import List, Sequence
+
+from qgis.core import QgsGeometry, QgsPointXY
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+WKB_NDR = 1  # リトルエンディアン
+WKB_POINT = 1
+WKB_MULTIPOINT = 4
+_MULTI_HEADER = struct.Struct('<BII')
+_POINT = struct.Struct('<BIdd')
+
+
+def point_wkb(x: float, y: float) -> bytes:
+    return _POINT.pack(WKB_NDR, WKB_POINT, x, y)
+
+
+def multipoint_wkb(xs: Sequence[float], ys: Sequence[float]) -> bytes:
+    """xs/ys (同じ長さ) から MultiPoint の WKB を作る。"""
+    n = len(xs)
+    header = _MULTI_HEADER.pack(WKB_NDR, WKB_MULTIPOINT, n)
+    if np is not None:
+        buf = np.empty(n, dtype=[('order', 'u1'), ('type', '<u4'), ('x', '<f8'), ('y', '<f8')])
+        buf['order'] = WKB_NDR
+        buf['type'] = WKB_POINT
+        buf['x'] = xs
+        buf['y'] = ys
+        return header + buf.tobytes()
+    fmt = struct.Struct('<' + 'BIdd' * n)
+    args = []
+    for x, y in zip(xs, ys):
+        args += (WKB_NDR, WKB_POINT, x, y)
+    return header + fmt.pack(*args)
+
+
+def point_geometries(xs: Sequence[float], ys: Sequence[float]) -> List[QgsGeometry]:
+    """座標配列から点の QgsGeometry のリストを (入力順に) 作る。"""
+    if not len(xs):
+        return []
+    collection = QgsGeometry()
+    collection.fromWkb(multipoint_wkb(xs, ys))
+    parts = collection.asGeometryCollection()
+    if len(parts) == len(xs):
+        return parts
+    return [QgsGeometry.fromPointXY(QgsPointXY(x, y)) for x, y in zip(xs, ys)]
@@ -0,0 +1,135 @@
+"""CSV inspection task.
+
+ファイル全体の走査 (件数・列統計) をバックグラウンドで実行する。
+ヘッダ/フィールド判定は先頭サンプルのみで即時に表示し、本タスクの結果は
+finished() (メインスレッド) でコールバックへ渡して後から反映する。
+ファイルは 1 回だけ読む。件数・列統計と同じパスで、非圧縮ファイルでは行オフセット索引
+(row_index) を作り、column_types (ドロップ時の即時サンプルからの推定型) を全行の値で検証する
+(meta の column_types)。
+header を渡すと、即時判定 (少数行) に代わる一様サンプル (sample_rows) を走査後に索引から
+取り直し、低カーディナリティ列 (low_cardinality) をこのサンプルで判定する。
+途中でデコードできないバイトがあり代替エンコーディングの候補がある場合は、候補でファイル全体を
+デコードできるかを確かめる (meta の encoding_suggested_verified)。
+"""
+from __future__ import annotations
+from typing import Callable, List, Optional, Sequence
+from qgis.core import QgsTask
+from .csv_source import is_plain
+from .record_counter import is_byte_countable
+from .row_index import RowIndex, RowIndexBuilder
+from .row_sampler import sample_rows
+from .value_interner import low_cardinality_columns
+
+
+class InspectTask(QgsTask):
+    def __init__(
+        self,
+        description: str,
+        path: str,
+        inspector,
+        encoding: str = 'utf-8',
+        delimiter: str = ',',
+        finished_callback: Optional[Callable[[bool, dict], None]] = None,
+        header: Optional[Sequence[str]] = None,
+        column_types: Optional[Sequence[str]] = None,
+        ) -> None:
+        super().__init__(description, QgsTask.CanCancel)
+        self.path = path
+        self.inspector = inspector
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.header = list(header or [])
+        self.column_types = list(column_types) if column_types else None
+        self._finished_callback = finished_callback
+        self.meta: dict = {}
+        self.row_index: Optional[RowIndex] = None
+        self.sample_rows: List[List[str]] = []
+        self.error: Optional[str] = None
+
+    # -------- background thread --------
+    def run(self) -> bool:
+        try:
+            # QgsTask 自身が isCanceled() / setProgress() を持つため feedback として渡す
+            builder = None
+            if is_plain(self.path) and is_byte_countable(self.encoding):
+                builder = RowIndexBuilder()
+            # 件数・列統計・列型の検証・行索引を 1 回の走査で求める
+            self.meta = dict(self.inspector.scan(self.path, feedback=self, column_types=self.column_types,
+                                                 index=builder))
+            if self.isCanceled() or self.meta.get('canceled'):
+                return False
+            if builder is not None:
+                index = builder.finish()
+                if index is not None and index.record_count == self.meta.get('record_count'):
+                    self.row_index = index
+            if self.header:
+                # 索引があればシークのみで取る (ファイルを読み直さない)
+                self.sample_rows = sample_rows(self.path, self.encoding, self.delimiter, self.header,
+                                               row_index=self.row_index)
+                self.meta['low_cardinality'] = low_cardinality_columns(self.header, self.sample_rows)
+            suggested = self.meta.get('encoding_suggested')
+            if suggested and not self.meta.get('canceled'):
+                # 候補はデコード失敗箇所だけで選んだもの。ファイル全体をデコードできる場合のみ切替可とする
+                self.meta['encoding_suggested_verified'] = bool(
+                    self.inspector.decodes_cleanly(self.path, suggested, feedback=self))
+        except Exception as ex:  # noqa
+            self.error = str(ex)
+            return False
+        if self.isCanceled() or self.meta.get('canceled'):
+            return False
+        return True
+
+    # -------- main thread --------
+    def finished(self, result: bool) -> None:  # noqa
+        if self._finished_callback:
+            try:
+                self._finished_callback(result, self.meta)
+            except Exception:
+                pass
+
+
+class ValidateTypesTask(QgsTask):
+    """列型の全行検証をバックグラウンドで実行する。
+
+    全体走査 (InspectTask) が済む前にビルドした場合に使う。サンプルから推定した
+    column_types を CsvInspector.validate_types で検証し、finished() でコールバックへ
+    (成否, 検証済みの列型) を渡す。
+    """
+
+    def __init__(
+        self,
+        description: str,
+        path: str,
+        inspector,
+        encoding: str,
+        delimiter: str,
+        column_types: Sequence[str],
+        finished_callback: Optional[Callable[[bool, Optional[List[str]]], None]] = None,
+        ) -> None:
+        super().__init__(description, QgsTask.CanCancel)
+        self.path = path
+        self.inspector = inspector
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.sampled = list(column_types)
+        self._finished_callback = finished_callback
+        self.column_types: Optional[List[str]] = None
+        self.error: Optional[str] = None
+
+    # -------- background thread --------
+    def run(self) -> bool:
+        try:
+            self.column_types = self.inspector.validate_types(self.path, self.encoding, self.delimiter,
+                                                              self.sampled, feedback=self)
+        except Exception as ex:  # noqa
+            self.error = str(ex)
+            return False
+        return self.column_types is not None and not self.isCanceled()
+
+    # -------- main thread --------
+    def finished(self, result: bool) -> None:  # noqa
+        if self._finished_callback:
+            try:
+                self._finished_callback(result, self.column_types)
+            except Exception:
+                pass
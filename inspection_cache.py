@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""CSV 解析結果のディスクキャッシュ
+同じファイルを再ドロップした際に、エンコーディング/区切り/ヘッダ/件数/列統計/
+検証済みの列型/低カーディナリティ列の再計算を省略する。
+- キー: 絶対パス + サイズ + mtime + 先頭/末尾バイトのハッシュ
+- 1 エントリ 1 JSON ファイル。参照時に mtime を更新し、最大件数を超えたら古い順に削除 (LRU)
+- 行オフセット索引 (row_index) はエントリ横の <key>.idx に保存し、エントリと一緒に削除
+"""
+from __future__ import annotations
+import os
+import json
+import glob
+import hashlib
+from typing import Optional
+from .row_index import RowIndex
+
+# キャッシュ対象のキー (field 判定結果はユーザ設定に依存するため含めない)
+CACHED_KEYS = ('encoding', 'delimiter', 'delimiter_confidence', 'header', 'record_count', 'column_stats',
+               'column_types', 'low_cardinality')
+
+
+class InspectionCache:
+    MAX_ENTRIES = 64
+    HASH_BYTES = 65536
+    VERSION = 3
+
+    def __init__(self, cache_dir: str, max_entries: int = MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def key_for(self, path: str) -> Optional[str]:
+        """ファイルの同一性キー。取得できない場合は None。"""
+        try:
+            st = os.stat(path)
+            h = hashlib.sha1()
+            h.update(f'{self.VERSION}|{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}'.encode('utf-8'))
+            with open(path, 'rb') as f:
+                h.update(f.read(self.HASH_BYTES))
+                if st.st_size > self.HASH_BYTES:
+                    f.seek(max(self.HASH_BYTES, st.st_size - self.HASH_BYTES))
+                    h.update(f.read(self.HASH_BYTES))
+            return h.hexdigest()
+        except OSError:
+            return None
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, key: Optional[str]) -> Optional[dict]:
+        if not key:
+            return None
+        p = self._entry_path(key)
+        try:
+            with open(p, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # LRU: 参照時刻として mtime を更新
+            os.utime(p, None)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) else None
+
+    def put(self, key: Optional[str], meta: dict) -> None:
+        if not key:
+            return
+        data = {k: meta[k] for k in CACHED_KEYS if k in meta}
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            p = self._entry_path(key)
+            tmp = p + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, p)
+            self._evict()
+        except OSError:
+            pass
+
+    def _index_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + '.idx')
+
+    def get_index(self, key: Optional[str]) -> Optional[RowIndex]:
+        if not key:
+            return None
+        return RowIndex.load(self._index_path(key))
+
+    def put_index(self, key: Optional[str], index: Optional[RowIndex]) -> None:
+        if not key or index is None:
+            return
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            p = self._index_path(key)
+            tmp = p + '.tmp'
+            index.save(tmp)
+            os.replace(tmp, p)
+        except OSError:
+            pass
+
+    def _evict(self) -> None:
+        entries = glob.glob(os.path.join(self.cache_dir, '*.json'))
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort(key=lambda p: os.path.getmtime(p))
+        for p in entries[:len(entries) - self.max_entries]:
+            self._remove_entry(p)
+
+    def _remove_entry(self, entry_path: str) -> None:
+        for p in (entry_path, os.path.splitext(entry_path)[0] + '.idx'):
+            try:
+                os.remove(p)
+            except OSError:
+                pass
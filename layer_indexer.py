@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""生成レイヤの索引作成 (ビルドの最終段)
+メモリレイヤや delimitedtext レイヤは空間インデックスを持たないため、地物の識別・矩形選択・
+後続の空間結合が全件走査になる。ビルド後 (プロジェクト追加前) に 1 回だけ索引を作る。
+- 空間インデックス: プロバイダが作成に対応し、まだ持っていない場合のみ
+  (GeoPackage は SPATIAL_INDEX=NO で出力し、ここで R-tree を作る。FlatGeobuf はファイル内の
+  packed R-tree を使う)
+- 属性インデックス: ドロップパネルで選んだキー列。作成できるのは GeoPackage (OGR) 出力のみ
+  (メモリ・delimitedtext・FlatGeobuf のプロバイダは CreateAttributeIndex を持たない)
+- 地物数が min_features 未満のレイヤは作らない (全件走査の方が安い)
+- 非同期ジオコーディングで後から形状を書き込む場合も、プロバイダ側で索引が更新される
+"""
+from __future__ import annotations
+import time
+from typing import List, Optional, Sequence
+
+from qgis.core import QgsFeatureSource, QgsVectorDataProvider, QgsVectorLayer
+
+# 既定の最小地物数 (設定で変更可、0 で常に作成)
+MIN_FEATURES = 10000
+
+
+class IndexReport:
+    """索引作成の結果。"""
+
+    def __init__(self, feature_count: int = 0):
+        self.feature_count = feature_count
+        self.spatial = False
+        self.attributes: List[str] = []
+        # 作成できなかった列 (プロバイダ未対応・失敗)
+        self.failed: List[str] = []
+        self.skipped = False
+        self.seconds = 0.0
+
+    def __bool__(self) -> bool:
+        return self.spatial or bool(self.attributes)
+
+    def message(self) -> str:
+        """ログ用の 1 行要約。"""
+        if self.skipped:
+            return f'索引作成: 省略 ({self.feature_count} 件)'
+        parts = []
+        if self.spatial:
+            parts.append('空間')
+        if self.attributes:
+            parts.append('属性 (' + ', '.join(self.attributes) + ')')
+        text = '索引作成: ' + (' + '.join(parts) or 'なし') + f' {self.seconds:.2f} 秒 ({self.feature_count} 件)'
+        if self.failed:
+            text += ' / 作成できない列: ' + ', '.join(self.failed)
+        return text
+
+
+def _needs_spatial_index(layer: QgsVectorLayer) -> bool:
+    pr = layer.dataProvider()
+    if not pr.capabilities() & QgsVectorDataProvider.CreateSpatialIndex:
+        return False
+    return layer.hasSpatialIndex() != QgsFeatureSource.SpatialIndexPresent
+
+
+def build_indexes(layer: QgsVectorLayer, key_columns: Optional[Sequence[str]] = None,
+                  min_features: int = MIN_FEATURES) -> IndexReport:
+    """layer に空間インデックスと key_columns の属性インデックスを作り、結果を返す。"""
+    report = IndexReport(layer.featureCount())
+    if report.feature_count < min_features:
+        report.skipped = True
+        return report
+    pr = layer.dataProvider()
+    started = time.perf_counter()
+    if _needs_spatial_index(layer):
+        report.spatial = bool(pr.createSpatialIndex())
+    if key_columns:
+        fields = layer.fields()
+        can_index = bool(pr.capabilities() & QgsVectorDataProvider.CreateAttributeIndex)
+        for name in key_columns:
+            idx = fields.indexOf(name)
+            if idx >= 0 and can_index and pr.createAttributeIndex(idx):
+                report.attributes.append(name)
+            else:
+                report.failed.append(name)
+    report.seconds = time.perf_counter() - started
+    return report
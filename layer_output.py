@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""出力レイヤの生成 (メモリ / GeoPackage / FlatGeobuf)
+ビルド (緯度経度・住所) の出力先を切り替える。OutputTarget.open_sink() が返すシンクへ
+バッチ単位で add() し、最後に finish() で表示用レイヤを受け取る。
+- memory: 従来どおりメモリプロバイダ (プロジェクト保存で消える一時レイヤ)
+- gpkg: GeoPackage を空で作成し OGR プロバイダ経由でバッチ追加する。
+  OGR プロバイダの addFeatures は 1 回の呼出しを 1 トランザクションで実行するため、
+  バッチを大きく取る。空間インデックスは持たずに作成し (SPATIAL_INDEX=NO)、全件追加後に
+  layer_indexer.build_indexes が最小件数を満たす場合のみ作る
+- fgb: FlatGeobuf を QgsVectorFileWriter で書き出す。SPATIAL_INDEX=YES により GDAL が
+  クローズ時に地物を Hilbert 順に並べ替え、packed R-tree を書き込む。
+  FlatGeobuf は追記/更新できないため、後から属性・形状を書き換える非同期ジオコーディングでは
+  GeoPackage で代替する (updatable=True)
+"""
+from __future__ import annotations
+import os
+import re
+from qgis.core import (
+    QgsCoordinateReferenceSystem,
+    QgsFields,
+    QgsProject,
+    QgsVectorFileWriter,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+
+from .csv_source import TEXT_EXTENSIONS, compression_of
+
+OUTPUT_MEMORY = 'memory'
+OUTPUT_GPKG = 'gpkg'
+OUTPUT_FGB = 'fgb'
+# (値, 表示名)
+OUTPUT_FORMATS = (
+    (OUTPUT_MEMORY, 'メモリ (一時レイヤ)'),
+    (OUTPUT_GPKG, 'GeoPackage'),
+    (OUTPUT_FGB, 'FlatGeobuf'),
+)
+BATCH_SIZES = {
+    OUTPUT_MEMORY: 10000,
+    OUTPUT_GPKG: 50000,
+    OUTPUT_FGB: 50000,
+}
+CRS = 'EPSG:4326'
+# 属性インデックスを作れる出力形式 (メモリプロバイダ・FlatGeobuf は非対応)
+ATTRIBUTE_INDEX_FORMATS = (OUTPUT_GPKG,)
+
+
+def _safe_name(name: str) -> str:
+    n = re.sub(r'[^0-9A-Za-z_]+', '_', name).strip('_')
+    return n or 'points'
+
+
+def _unique_path(path: str) -> str:
+    base, ext = os.path.splitext(path)
+    n = 1
+    while os.path.exists(path):
+        path = f'{base}_{n}{ext}'
+        n += 1
+    return path
+
+
+def _fid_column(fields: QgsFields) -> str:
+    """CSV 列と衝突しない FID 列名。"""
+    names = {fields.at(i).name().lower() for i in range(fields.count())}
+    fid = 'fid'
+    while fid in names:
+        fid = '_' + fid
+    return fid
+
+
+def _writer(path: str, driver: str, layer_name: str, fields: QgsFields, layer_options) -> QgsVectorFileWriter:
+    opts = QgsVectorFileWriter.SaveVectorOptions()
+    opts.driverName = driver
+    opts.layerName = _safe_name(layer_name)
+    opts.fileEncoding = 'UTF-8'
+    opts.layerOptions = list(layer_options)
+    writer = QgsVectorFileWriter.create(
+        path, fields, QgsWkbTypes.Point, QgsCoordinateReferenceSystem(CRS),
+        QgsProject.instance().transformContext(), opts)
+    if writer.hasError() != QgsVectorFileWriter.NoError:
+        msg = writer.errorMessage()
+        del writer
+        raise RuntimeError(msg or f'{driver} の作成に失敗しました: {path}')
+    return writer
+
+
+def _open_ogr(uri: str, layer_name: str) -> QgsVectorLayer:
+    layer = QgsVectorLayer(uri, layer_name, 'ogr')
+    if not layer.isValid():
+        raise RuntimeError(f'出力ファイルを開けません: {uri}')
+    return layer
+
+
+class LayerSink:
+    """レイヤのデータプロバイダへ直接追加するシンク (memory / gpkg)。
+
+    fields は呼出し側の属性の並び (地物はこの並びで作る)。OGR プロバイダで開き直した GeoPackage は
+    主キー (fid) 列を先頭に持つため、add() でプロバイダの並びに合わせて fid の位置に NULL を補う。
+    """
+
+    def __init__(self, layer: QgsVectorLayer, fields: QgsFields = None):
+        self.layer = layer
+        self._pr = layer.dataProvider()
+        self.fields = fields if fields is not None else layer.fields()
+        names = {self.fields.at(i).name() for i in range(self.fields.count())}
+        provider_fields = self._pr.fields()
+        # 呼出し側の fields に無い主キー列の位置 (昇順に挿入すれば元の位置に収まる)
+        self._pk_slots = sorted(i for i in self._pr.pkAttributeIndexes()
+                                if provider_fields.at(i).name() not in names)
+
+    def add(self, feats) -> None:
+        if self._pk_slots:
+            for feat in feats:
+                attrs = feat.attributes()
+                for i in self._pk_slots:
+                    attrs.insert(i, None)
+                feat.setAttributes(attrs)
+        if not self._pr.addFeatures(feats):
+            raise RuntimeError('; '.join(self._pr.errors()) or '地物の追加に失敗しました')
+
+    def finish(self) -> QgsVectorLayer:
+        return self.layer
+
+
+class WriterSink:
+    """QgsVectorFileWriter で書き出し、finish() で閉じてから OGR レイヤとして開くシンク (fgb)。"""
+
+    def __init__(self, writer: QgsVectorFileWriter, path: str, layer_name: str, fields: QgsFields):
+        self._writer = writer
+        self._path = path
+        self._layer_name = layer_name
+        self.fields = fields
+
+    def add(self, feats) -> None:
+        if not self._writer.addFeatures(feats):
+            raise RuntimeError(self._writer.errorMessage() or '地物の書込に失敗しました')
+
+    def finish(self) -> QgsVectorLayer:
+        # 閉じた時点で GDAL が Hilbert ソートと空間インデックスの書込を行う
+        del self._writer
+        return _open_ogr(self._path, self._layer_name)
+
+
+class OutputTarget:
+    """出力形式と出力先フォルダ。directory が空なら CSV と同じフォルダに書く。"""
+
+    def __init__(self, fmt: str = OUTPUT_MEMORY, directory: str = ''):
+        self.format = fmt if fmt in BATCH_SIZES else OUTPUT_MEMORY
+        self.directory = directory
+
+    @property
+    def batch_size(self) -> int:
+        return BATCH_SIZES[self.format]
+
+    @property
+    def supports_attribute_index(self) -> bool:
+        return self.format in ATTRIBUTE_INDEX_FORMATS
+
+    def path_for(self, csv_path: str, ext: str) -> str:
+        # 圧縮拡張子 (.gz 等) → テキスト拡張子 (.csv 等) の順に 1 つずつ外す (途中のドットは残す)
+        stem = os.path.basename(csv_path)
+        if compression_of(stem):
+            stem = stem[:stem.rfind('.')]
+        if stem.lower().endswith(TEXT_EXTENSIONS):
+            stem = stem[:stem.rfind('.')]
+        stem = stem or 'points'
+        directory = self.directory or os.path.dirname(os.path.abspath(csv_path))
+        return _unique_path(os.path.join(directory, stem + ext))
+
+    def open_sink(self, csv_path: str, layer_name: str, fields: QgsFields, updatable: bool = False):
+        """fields を持つ空のポイント (EPSG:4326) 出力先を開き、シンクを返す。
+
+        updatable=True は完成後のレイヤを書き換える用途 (FlatGeobuf は GeoPackage で代替)。
+        """
+        fmt = self.format
+        if fmt == OUTPUT_FGB and updatable:
+            fmt = OUTPUT_GPKG
+        if fmt == OUTPUT_FGB:
+            path = self.path_for(csv_path, '.fgb')
+            return WriterSink(_writer(path, 'FlatGeobuf', layer_name, fields, ['SPATIAL_INDEX=YES']),
+                              path, layer_name, fields)
+        if fmt == OUTPUT_GPKG:
+            path = self.path_for(csv_path, '.gpkg')
+            table = _safe_name(layer_name)
+            writer = _writer(path, 'GPKG', layer_name, fields, ['SPATIAL_INDEX=NO', f'FID={_fid_column(fields)}'])
+            del writer  # 空のテーブルだけ作って閉じ、OGR プロバイダで開き直す
+            return LayerSink(_open_ogr(f'{path}|layername={table}', layer_name), fields=fields)
+        layer = QgsVectorLayer(f'Point?crs={CRS}', layer_name, 'memory')
+        layer.dataProvider().addAttributes(fields)
+        layer.updateFields()
+        return LayerSink(layer, fields=fields)
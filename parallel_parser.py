@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""緯度経度ビルド向けのマルチプロセス CSV パーサ
+ファイルをレコード境界 (クォート内改行を考慮) のバイト位置で分割し、各ワーカープロセスが
+デコード・CSV 解析・座標変換・範囲チェックまでを行う。メインスレッドは返却された
+座標配列 (array('d')) と属性タプルから地物を組み立てるだけにする。
+型付き属性 (type_inference) の変換と低カーディナリティ列のインターン (value_interner)、
+単純な列条件の行フィルタ (row_filter.ColumnPredicate) もワーカー側で行う。
+座標はチャンク全体の緯度/経度列をまとめて coordinate_columns で変換する (列の表記形式は呼び出し側で判定済み)。
+座標文字列のメモ (ParseMemo) はワーカープロセスごとに保持し、チャンクをまたいで再利用する。
+- 非圧縮かつ ASCII 互換エンコーディングのファイルのみ対象 (それ以外は呼び出し側で逐次処理)
+- QGIS 埋め込み環境では sys.executable が QGIS 本体のため、Python 実行ファイルを探して spawn する
+- QGIS モジュールに依存しない (ワーカー側で import されるため)
+"""
+from __future__ import annotations
+import io
+import os
+import csv
+import sys
+import math
+import mmap
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .coordinate_columns import parse_block
+from .coordinate_parser import FORMAT_GENERIC, ParseMemo
+from .type_inference import RowConverter
+from .value_interner import ValueInterner
+from .csv_source import is_plain
+from .record_counter import is_byte_countable, _detect_terminator
+
+QUOTE = b'"'
+# 並列化する最小ファイルサイズ (これ未満はプロセス起動コストの方が大きい)
+MIN_PARALLEL_BYTES = 32 << 20
+# 1 チャンクあたりの目安サイズ (ワーカーへの分配単位)
+CHUNK_BYTES = 16 << 20
+
+# ワーカープロセス内の座標メモ (チャンクをまたいで保持)
+_worker_memo: Optional[ParseMemo] = None
+
+
+def _memo_for(size: int) -> Optional[ParseMemo]:
+    global _worker_memo
+    if size <= 0:
+        return None
+    if _worker_memo is None or _worker_memo.maxsize != size:
+        _worker_memo = ParseMemo(size)
+    return _worker_memo
+
+
+def python_executable() -> Optional[str]:
+    """ワーカー起動に使う Python 実行ファイル。見つからなければ None。"""
+    exe = sys.executable or ''
+    if os.path.basename(exe).lower().startswith('python'):
+        return exe
+    if os.name == 'nt':
+        candidates = ('pythonw.exe', 'python.exe', os.path.join('bin', 'python.exe'))
+    else:
+        candidates = (os.path.join('bin', 'python3'), os.path.join('bin', 'python'))
+    for name in candidates:
+        path = os.path.join(sys.exec_prefix, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def can_parallelize(path: str, encoding: str, min_bytes: int = MIN_PARALLEL_BYTES) -> bool:
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return False
+    return (size >= min_bytes and is_plain(path) and is_byte_countable(encoding)
+            and python_executable() is not None)
+
+
+def _record_end(mm, pos: int, quotes_before: int, terminator: bytes) -> int:
+    """pos 以降で最初のクォート外の行終端の直後の位置。
+
+    quotes_before は先頭から pos までのクォート数 (偶数ならクォート外)。
+    """
+    size = len(mm)
+    parity = quotes_before
+    while pos < size:
+        nl = mm.find(terminator, pos)
+        if nl < 0:
+            return size
+        parity += mm[pos:nl].count(QUOTE)
+        pos = nl + 1
+        if parity % 2 == 0:
+            return pos
+    return size
+
+
+def find_chunk_boundaries(path: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """ヘッダ行を除いたデータ部を、レコード境界で揃えた (start, end) に分割する。"""
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        size = len(mm)
+        terminator = _detect_terminator(mm[:65536])
+        data_start = _record_end(mm, 0, 0, terminator)
+        span = max(1, (size - data_start) // max(1, n_chunks))
+        bounds = [data_start]
+        quotes = mm[:data_start].count(QUOTE)
+        prev = data_start
+        for k in range(1, n_chunks):
+            target = data_start + k * span
+            if target <= bounds[-1]:
+                continue
+            if target >= size:
+                break
+            quotes += mm[prev:target].count(QUOTE)
+            end = _record_end(mm, target, quotes, terminator)
+            quotes += mm[target:end].count(QUOTE)
+            prev = end
+            if end >= size:
+                break
+            bounds.append(end)
+        bounds.append(size)
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+
+def parse_chunk(args) -> dict:
+    """ワーカー: [start, end) を解析し、座標配列と属性を返す。
+
+    戻り値: lat/lon (array('d')、変換失敗は NaN)、errors ({行番号: メッセージ})、attrs (選択列のタプル)、
+    mismatches (型変換できず NULL にした値の数)、scanned (フィルタ前の行数)、
+    memo_hits / memo_misses (このチャンクでの座標メモのヒット/ミス数)
+    """
+    (path, start, end, encoding, delimiter, ncols, idx_lat, idx_lon, keep_idx, types, names, intern_pos, row_filter,
+     formats, memo_size) = args
+    memo = _memo_for(memo_size)
+    convert = RowConverter(types or [], names)
+    intern = ValueInterner(intern_pos or [])
+    with open(path, 'rb') as f:
+        f.seek(start)
+        raw = f.read(end - start)
+    text = raw.decode(encoding, errors='replace')
+    lat_texts = []
+    lon_texts = []
+    type_errors = {}
+    attrs = []
+    scanned = 0
+    for row in csv.reader(io.StringIO(text, newline=''), delimiter=delimiter):
+        if not row:
+            continue
+        if len(row) < ncols:
+            row += [''] * (ncols - len(row))
+        scanned += 1
+        if row_filter is not None and not row_filter.test(row):
+            continue
+        values = [row[i] for i in keep_idx]
+        if convert:
+            err = convert(values)
+            if err:
+                type_errors[len(attrs)] = err
+        if intern:
+            intern(values)
+        lat_texts.append(row[idx_lat])
+        lon_texts.append(row[idx_lon])
+        attrs.append(tuple(values))
+    hits, misses = (memo.hits, memo.misses) if memo is not None else (0, 0)
+    lats, lons, errors = parse_block(lat_texts, lon_texts, *formats, memo=memo)
+    if memo is not None:
+        hits, misses = memo.hits - hits, memo.misses - misses
+    # 座標のエラーを優先
+    for i, err in type_errors.items():
+        errors.setdefault(i, err)
+    return {'lat': lats, 'lon': lons, 'errors': errors, 'attrs': attrs, 'mismatches': convert.mismatches,
+            'scanned': scanned, 'memo_hits': hits, 'memo_misses': misses}
+
+
+def default_workers() -> int:
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+def iter_chunks(path: str, encoding: str, delimiter: str, header: Sequence[str],
+                idx_lat: int, idx_lon: int, keep_idx: Sequence[int], workers: int,
+                row_index=None, types: Optional[Sequence[str]] = None,
+                intern_pos: Optional[Sequence[int]] = None, row_filter=None,
+                formats: Tuple[str, str] = (FORMAT_GENERIC, FORMAT_GENERIC), memo_size: int = 0) -> Iterator[dict]:
+    """ファイルを workers 個のプロセスで解析し、チャンク結果をファイル順に返す。
+
+    row_index (row_index.RowIndex) があれば境界探索を省いて索引のオフセットで分割する。
+    types (keep_idx 順の列型) を渡すと属性をワーカー側で型変換する。
+    intern_pos (keep_idx 内の位置) の列は値をインターンする。
+    row_filter (row_filter.ColumnPredicate) に合わない行はワーカー側で捨てる。
+    formats は (緯度列, 経度列) の表記形式 (coordinate_parser.classify_columns)。
+    memo_size > 0 なら各ワーカーで座標文字列の変換結果をその件数まで保持する。
+    同時に処理中/未回収のチャンクは workers * 2 個までに抑え、メモリ使用量を一定に保つ。
+    """
+    size = os.path.getsize(path)
+    n_chunks = max(workers * 4, size // CHUNK_BYTES)
+    if row_index is not None and row_index.file_size == size:
+        bounds = row_index.split(n_chunks)
+    else:
+        bounds = find_chunk_boundaries(path, n_chunks)
+    names = [header[i] for i in keep_idx]
+    types = list(types) if types else None
+    intern_pos = list(intern_pos) if intern_pos else None
+    jobs = iter([(path, a, b, encoding, delimiter, len(header), idx_lat, idx_lon, list(keep_idx), types, names, intern_pos,
+                  row_filter, tuple(formats), memo_size)
+                 for a, b in bounds])
+    ctx = multiprocessing.get_context('spawn')
+    ctx.set_executable(python_executable())
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        pending = deque(pool.submit(parse_chunk, job) for job in islice(jobs, workers * 2))
+        while pending:
+            res = pending.popleft().result()
+            job = next(jobs, None)
+            if job is not None:
+                pending.append(pool.submit(parse_chunk, job))
+            yield res
+
+
+def iter_rows(chunks: Iterable[dict], counter: Optional[RowConverter] = None,
+              row_filter=None, memo: Optional[ParseMemo] = None) -> Iterator[Tuple[list, Optional[float], Optional[float], str]]:
+    """チャンク結果を (属性リスト, lat, lon, エラー文字列) に展開する。lat/lon は失敗時 None。
+
+    counter (RowConverter) を渡すと、ワーカーでの型不一致数を counter.mismatches に加算する。
+    row_filter を渡すと、ワーカーで評価した行数を row_filter.seen に加算する。
+    memo を渡すと、ワーカーでの座標メモのヒット/ミス数を加算する。
+    """
+    for res in chunks:
+        errors = res['errors']
+        if counter is not None:
+            counter.mismatches += res.get('mismatches', 0)
+        if row_filter is not None:
+            row_filter.seen += res.get('scanned', 0)
+        if memo is not None:
+            memo.add_counts(res.get('memo_hits', 0), res.get('memo_misses', 0))
+        for i, (attrs, lat, lon) in enumerate(zip(res['attrs'], res['lat'], res['lon'])):
+            if math.isnan(lat):
+                yield list(attrs), None, None, errors.get(i, '')
+            else:
+                yield list(attrs), lat, lon, errors.get(i, '')
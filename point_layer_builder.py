@@ -1,17 +1,306 @@
 # -*- coding: utf-8 -*-
 """Point layer builder (Phase B minimal)
 緯度経度フィールドを使ってメモリレイヤへポイントをロード。
+columns を指定すると、その列 (+ 必須列) のみを属性として保持する (列の射影)。
+workers > 1 かつ大きな非圧縮ファイルでは parallel_parser で複数プロセスに解析を分担させる。
+読込・解析・追加は batch_size 件ごとに行い (全地物をリストに溜めない)、バッチごとに進捗を通知する。
+地物はテンプレートの複製で作り、範囲はループ中に集計して最後に setExtent する (全件再走査を避ける)。
+出力先は layer_output.OutputTarget で切替 (メモリ / GeoPackage / FlatGeobuf へ直接書込)。
+サンプル行で両座標列が単純な 10 進数と確認でき、全体走査で座標に空値が無いと分かっている場合は、
+Python で解析せず QGIS の delimitedtext プロバイダ (C++) で直接読む (メモリ出力・全列・非圧縮ファイルのみ)。
+スキーマは Python 解析と同じ (全列 + _parse_error。_parse_error は範囲外の座標を示す式フィールド)。
+違いは範囲外の座標の行も点を持つことのみ (Python 解析では形状なし)。
+プロバイダの型判定が推定型と食い違うと見込まれる列 (先頭ゼロのコード・日付・真偽値・int64) があれば
+ファイルを開く前に Python 解析を選ぶ。
+column_types (type_inference の列型) を渡すと属性を型付きフィールド (Int/LongLong/Double/Date/Bool) で保持する。
+サンプル外の行で変換できない値は NULL とし、_parse_error に記録して type_mismatches に件数を残す。
+intern_columns (低カーディナリティ列) の文字列値は value_interner で共有し、同じ値の重複を持たない。
+row_filter (row_filter.compile_filter) を渡すと読込ループ内で評価し、条件外の行は地物にしない。
+座標は COLUMN_BLOCK 行ごとに緯度/経度列をまとめて coordinate_columns で変換する (NumPy があれば一括変換)。
+列の表記形式 (10 進 / DMS / 度分秒 / 方位記号 / "緯度,経度" の結合) はサンプル行で一度だけ判定し、
+形式専用のパーサで変換する。緯度と経度に同じ列を指定すると結合形式の列として読む。
+memo_size > 0 なら座標文字列の変換結果を LRU で保持し (coordinate_parser.ParseMemo)、
+ヒット/ミス数を parse_cache_hits / parse_cache_misses に残す。
+点の形状はバッチ単位で geometry_factory (MultiPoint WKB を 1 回で分解) から作る。
 """
 from __future__ import annotations
-from qgis.core import QgsFields, QgsField, QgsVectorLayer, QgsFeature, QgsPointXY, QgsGeometry
-from qgis.PyQt.QtCore import QVariant
+from qgis.core import QgsExpression, QgsFields, QgsField, QgsVectorLayer, QgsFeature, QgsRectangle
+from array import array
+from qgis.PyQt.QtCore import QVariant, QUrl, QUrlQuery
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from itertools import chain, islice
+import codecs
+from operator import itemgetter
 import csv
-from .coordinate_parser import parse_lat, parse_lon
+from .coordinate_parser import is_plain_decimal, classify_columns, FORMAT_GENERIC, ParseMemo
+from .coordinate_columns import parse_block
+from .csv_source import open_text, is_plain
+from . import parallel_parser
+from .value_interner import ValueInterner
+from .row_filter import RowFilter, ColumnPredicate
+from .type_inference import (
+    RowConverter, TYPE_STRING, TYPE_INT, TYPE_INT64, TYPE_DOUBLE, TYPE_DATE, TYPE_BOOL, DOUBLE_RE,
+)
+from .layer_output import OutputTarget, OUTPUT_MEMORY, CRS
+from .geometry_factory import point_geometries
+
+
+BATCH_SIZE = 10000
+# 逐次読込で座標を列単位に変換する行数
+COLUMN_BLOCK = 4096
+# delimitedtext プロバイダへ渡すエンコーディング名 (Python の正規名 → Qt のコーデック名)
+NATIVE_ENCODINGS = {
+    'utf-8': 'UTF-8',
+    'utf-8-sig': 'UTF-8',
+    'ascii': 'UTF-8',
+    'iso8859-1': 'ISO-8859-1',
+    'cp1252': 'windows-1252',
+    'euc_jp': 'EUC-JP',
+    'shift_jis': 'Shift_JIS',
+}
+# type_inference の列型 → フィールド型
+FIELD_TYPES = {
+    TYPE_STRING: QVariant.String,
+    TYPE_INT: QVariant.Int,
+    TYPE_INT64: QVariant.LongLong,
+    TYPE_DOUBLE: QVariant.Double,
+    TYPE_DATE: QVariant.Date,
+    TYPE_BOOL: QVariant.Bool,
+}
+
+
+def field_type(type_name: str):
+    """列型名に対応する QVariant 型 (不明な型は String)。"""
+    return FIELD_TYPES.get(type_name, QVariant.String)
+
+
+def iter_batches(items: Iterable, size: int = BATCH_SIZE) -> Iterator[list]:
+    """items を size 件ずつのリストに分けて返す。"""
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+class ExtentTracker:
+    """追加した点の範囲を逐次集計し、最後にレイヤへ設定する。"""
+
+    def __init__(self):
+        self.xmin = self.ymin = float('inf')
+        self.xmax = self.ymax = float('-inf')
+
+    def add(self, x: float, y: float) -> None:
+        if x < self.xmin:
+            self.xmin = x
+        if x > self.xmax:
+            self.xmax = x
+        if y < self.ymin:
+            self.ymin = y
+        if y > self.ymax:
+            self.ymax = y
+
+    def add_all(self, xs: Sequence[float], ys: Sequence[float]) -> None:
+        """座標配列をまとめて加える。"""
+        if len(xs):
+            self.add(min(xs), min(ys))
+            self.add(max(xs), max(ys))
+
+    def apply(self, layer: QgsVectorLayer) -> None:
+        if self.xmin > self.xmax:
+            # 点が 1 つも無い
+            layer.updateExtents()
+            return
+        layer.setExtent(QgsRectangle(self.xmin, self.ymin, self.xmax, self.ymax))
+
+
+def projection_indices(header: Sequence[str], columns: Optional[Sequence[str]], required: Sequence[str] = ()) -> List[int]:
+    """保持する列のインデックス (ヘッダ順)。columns が None なら全列。required は常に含める。"""
+    if columns is None:
+        return list(range(len(header)))
+    keep = set(columns) | {c for c in required if c}
+    return [i for i, name in enumerate(header) if name in keep]
+
+
+def row_projector(keep_idx: Sequence[int], ncols: int) -> Callable[[list], list]:
+    """行 (ncols 列以上にパディング済み) から保持列のリストを取り出す関数を返す。"""
+    keep_idx = list(keep_idx)
+    if keep_idx == list(range(ncols)):
+        # 全列: 余分な列が無ければ行そのものを使う (複製しない)
+        return lambda row: row if len(row) == ncols else row[:ncols]
+    if len(keep_idx) == 1:
+        i = keep_idx[0]
+        return lambda row: [row[i]]
+    getter = itemgetter(*keep_idx)
+    return lambda row: list(getter(row))
+
+
+def iter_parsed_rows(csv_path: str, encoding: str, delimiter: str, header: Sequence[str],
+                     idx_lat: int, idx_lon: int, keep_idx: Sequence[int],
+                     convert: Optional[RowConverter] = None,
+                     intern: Optional[ValueInterner] = None,
+                     row_filter: Optional[RowFilter] = None,
+                     formats: Tuple[str, str] = (FORMAT_GENERIC, FORMAT_GENERIC),
+                     memo: Optional[ParseMemo] = None) -> Iterator[Tuple[list, Optional[float], Optional[float], str]]:
+    """逐次版: (属性リスト, lat, lon, エラー文字列) を返す。lat/lon は失敗時 None。
+
+    convert (RowConverter、keep_idx 順) を渡すと属性を型変換し、intern (ValueInterner) で値を共有する。
+    row_filter に合わない行は返さない。formats は (緯度列, 経度列) の表記形式。memo は座標文字列のメモ。
+    """
+    ncols = len(header)
+    project = row_projector(keep_idx, ncols)
+
+    def _rows(reader):
+        for row in reader:
+            if not row:
+                continue
+            # 行長が短い場合パディング (その場で拡張)
+            if len(row) < ncols:
+                row.extend([''] * (ncols - len(row)))
+            if row_filter is not None and not row_filter(row):
+                continue
+            yield row
+
+    with open_text(csv_path, encoding) as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        # skip header
+        next(reader, None)
+        for block in iter_batches(_rows(reader), COLUMN_BLOCK):
+            lats, lons, errors = parse_block([r[idx_lat] for r in block], [r[idx_lon] for r in block], *formats,
+                                             memo=memo)
+            for i, row in enumerate(block):
+                error = errors.get(i, '')
+                attrs = project(row)
+                if convert:
+                    type_error = convert(attrs)
+                    error = error or type_error
+                if intern:
+                    intern(attrs)
+                lat = lats[i]
+                if lat != lat:  # NaN: 座標の変換失敗
+                    yield attrs, None, None, error
+                else:
+                    yield attrs, lat, lons[i], error
+
+
+def native_codec(encoding: str) -> Optional[str]:
+    """delimitedtext プロバイダで使えるコーデック名。対応外は None。"""
+    try:
+        return NATIVE_ENCODINGS.get(codecs.lookup(encoding).name)
+    except LookupError:
+        return None
+
+
+def plain_decimal_coordinates(rows: Sequence[Sequence[str]], idx_lat: int, idx_lon: int) -> bool:
+    """サンプルの全行で緯度/経度が単純な 10 進数かつ範囲内か (空値を含む場合も False)。"""
+    if not rows:
+        return False
+    for row in rows:
+        lat = row[idx_lat]
+        lon = row[idx_lon]
+        if not (is_plain_decimal(lat) and is_plain_decimal(lon)):
+            return False
+        if not (-90 <= float(lat) <= 90 and -180 <= float(lon) <= 180):
+            return False
+    return True
+
+
+def delimitedtext_uri(csv_path: str, codec: str, delimiter: str, lat_field: str, lon_field: str,
+                      detect_types: bool = False) -> str:
+    url = QUrl.fromLocalFile(csv_path)
+    query = QUrlQuery()
+    for key, val in (
+        ('type', 'csv'),
+        ('encoding', codec),
+        ('delimiter', '\\t' if delimiter == '\t' else delimiter),
+        ('quote', '"'),
+        ('escape', '"'),
+        ('useHeader', 'yes'),
+        # 型推定なしのビルドと同じく全列文字列 (detect_types=True はプロバイダの型判定に任せる)
+        ('detectTypes', 'yes' if detect_types else 'no'),
+        ('xField', lon_field),
+        ('yField', lat_field),
+        ('crs', CRS),
+        ('spatialIndex', 'yes'),
+        ('subsetIndex', 'no'),
+        ('watchFile', 'no'),
+    ):
+        query.addQueryItem(key, val)
+    url.setQuery(query)
+    return bytes(url.toEncoded()).decode('ascii')
+
+
+# delimitedtext プロバイダの型判定 (全件) と結果が一致する列型
+NATIVE_TYPES = (TYPE_STRING, TYPE_INT, TYPE_DOUBLE)
+
+
+def native_types_agree(types: Sequence[str], rows: Sequence[Sequence[str]]) -> bool:
+    """プロバイダの型判定が全列で推定型 (全行で検証済み) と同じになると見込めるか。
+
+    - int64: プロバイダは int32 に収まれば Int にするため、サンプルからは決められない
+    - date / bool: プロバイダの判定規則 (書式・語) が異なる
+    - string: サンプルに数値でない値が無い列 (先頭ゼロのコード等) はプロバイダが数値と判定しうる
+    """
+    for i, t in enumerate(types):
+        if t not in NATIVE_TYPES:
+            return False
+        if t == TYPE_STRING:
+            values = [r[i] for r in rows if i < len(r) and r[i] != '']
+            if values and all(DOUBLE_RE.match(v) for v in values):
+                return False
+    return True
+
+
+def parse_error_expression(lat_field: str, lon_field: str) -> str:
+    """delimitedtext レイヤの _parse_error (Python 解析と同じ範囲外エラー) を求める式。"""
+    lat = QgsExpression.quotedColumnRef(lat_field)
+    lon = QgsExpression.quotedColumnRef(lon_field)
+    return (f"CASE WHEN abs({lat}) > 90 THEN 'Latitude out of range' "
+            f"WHEN abs({lon}) > 180 THEN 'Longitude out of range' END")
+
 
 class PointLayerBuilder:
-    def build_memory_layer(self, csv_path: str, encoding: str, delimiter: str, header: list, lat_field: str, lon_field: str, layer_name: str = 'CSV Points') -> QgsVectorLayer:
-        layer = QgsVectorLayer("Point?crs=EPSG:4326", layer_name, "memory")
-        pr = layer.dataProvider()
+    def __init__(self):
+        # 直近のビルドで型変換できず NULL にした値の数
+        self.type_mismatches = 0
+        # 直近のビルドでの座標メモのヒット/ミス数
+        self.parse_cache_hits = 0
+        self.parse_cache_misses = 0
+
+    def build_memory_layer(self, csv_path: str, encoding: str, delimiter: str, header: list, lat_field: str, lon_field: str, layer_name: str = 'CSV Points', columns: Optional[list] = None, workers: int = 1, row_index=None,
+                           total: Optional[int] = None, progress: Optional[Callable[[float], None]] = None,
+                           batch_size: Optional[int] = None, column_types: Optional[Sequence[str]] = None,
+                           intern_columns: Optional[Sequence[str]] = None,
+                           row_filter: Optional[RowFilter] = None, memo_size: int = 0) -> QgsVectorLayer:
+        """緯度経度列からポイントのメモリレイヤを作る (build_layer の出力先をメモリに固定)。"""
+        return self.build_layer(csv_path, encoding, delimiter, header, lat_field, lon_field, layer_name, columns,
+                                workers, row_index, total, progress, batch_size, output=None, column_types=column_types,
+                                intern_columns=intern_columns, row_filter=row_filter, memo_size=memo_size)
+
+    def build_layer(self, csv_path: str, encoding: str, delimiter: str, header: list, lat_field: str, lon_field: str, layer_name: str = 'CSV Points', columns: Optional[list] = None, workers: int = 1, row_index=None,
+                    total: Optional[int] = None, progress: Optional[Callable[[float], None]] = None,
+                    batch_size: Optional[int] = None, output: Optional[OutputTarget] = None,
+                    sample_rows: Optional[Sequence[Sequence[str]]] = None,
+                    column_types: Optional[Sequence[str]] = None,
+                    intern_columns: Optional[Sequence[str]] = None,
+                    row_filter: Optional[RowFilter] = None, memo_size: int = 0,
+                    complete_coordinates: bool = False) -> QgsVectorLayer:
+        """緯度経度列からポイントレイヤを作る。
+
+        output (OutputTarget) で出力先を指定 (None はメモリ)。batch_size 省略時は出力先ごとの既定値。
+        total (データ行数) と progress を渡すと、バッチ追加ごとに progress(0-100) を呼ぶ。
+        sample_rows (row_sampler のサンプル) が単純な 10 進座標で、complete_coordinates (全体走査で
+        緯度/経度列に空値が無いと確認済み) なら delimitedtext プロバイダで読む。
+        column_types (ヘッダ順の列型) を渡すと型付きフィールドで作る (None は全列文字列)。
+        intern_columns (列名) の文字列値はインターンする。
+        row_filter に合わない行は読込時に捨てる。QGIS 式のフィルタは並列パーサのワーカーで評価できないため逐次処理。
+        memo_size は座標文字列のメモの件数上限 (0 で無効)。
+        """
+        self.type_mismatches = 0
+        self.parse_cache_hits = self.parse_cache_misses = 0
+        output = output or OutputTarget()
+        batch_size = batch_size or output.batch_size
         # 既存属性: CSV の全列
         fields = QgsFields()
         # QgsField: 可能ならコンストラクタで型指定、古い環境のみ setType にフォールバック
@@ -25,46 +314,114 @@ class PointLayerBuilder:
                 except Exception:
                     pass
                 return f
-        for col in header:
-            fields.append(_mk_field(col, QVariant.String))
+        keep_idx = projection_indices(header, columns, (lat_field, lon_field))
+        types = [column_types[i] if i < len(column_types) else TYPE_STRING for i in keep_idx] if column_types else None
+        for n, i in enumerate(keep_idx):
+            fields.append(_mk_field(header[i], field_type(types[n]) if types else QVariant.String))
         # 補助列 (geocode 予定枠)
         fields.append(_mk_field('_parse_error', QVariant.String))
-        pr.addAttributes(fields)
-        layer.updateFields()
 
         idx_lat = header.index(lat_field) if lat_field in header else -1
         idx_lon = header.index(lon_field) if lon_field in header else -1
         if idx_lat < 0 or idx_lon < 0:
             raise ValueError('Latitude/Longitude field not found in header')
 
-        feats = []
-        with open(csv_path, 'r', encoding=encoding, errors='replace', newline='') as f:
-            reader = csv.reader(f, delimiter=delimiter)
-            # skip header
-            next(reader, None)
-            for row in reader:
-                if not row:
-                    continue
-                # 行長が短い場合パディング
-                if len(row) < len(header):
-                    row = row + [''] * (len(header) - len(row))
-                lat_raw = row[idx_lat]
-                lon_raw = row[idx_lon]
-                parse_error = ''
-                try:
-                    lat = parse_lat(lat_raw)
-                    lon = parse_lon(lon_raw)
-                except Exception as e:
-                    lat = None
-                    lon = None
-                    parse_error = str(e)
-                feat = QgsFeature(layer.fields())
-                # 属性設定
-                attrs = row[:len(header)] + [parse_error]
+        if (sample_rows and complete_coordinates and columns is None and row_filter is None
+                and output.format == OUTPUT_MEMORY):
+            layer = self._native_layer(csv_path, encoding, delimiter, lat_field, lon_field, layer_name,
+                                       sample_rows, idx_lat, idx_lon, types)
+            if layer is not None:
+                return layer
+
+        sink = output.open_sink(csv_path, layer_name, fields)
+        formats = classify_columns(sample_rows or [], idx_lat, idx_lon)
+        memo = ParseMemo(memo_size) if memo_size > 0 else None
+        convert = RowConverter(types or [], [header[i] for i in keep_idx])
+        intern_set = set(intern_columns or ())
+        # 型変換する列は str が残らないため文字列列のみ対象
+        intern_pos = [n for n, i in enumerate(keep_idx)
+                      if header[i] in intern_set and (types is None or types[n] == TYPE_STRING)]
+
+        rows = None
+        if (workers > 1 and parallel_parser.can_parallelize(csv_path, encoding)
+                and (row_filter is None or isinstance(row_filter, ColumnPredicate))):
+            try:
+                chunks = parallel_parser.iter_chunks(
+                    csv_path, encoding, delimiter, header, idx_lat, idx_lon, keep_idx, workers, row_index, types, intern_pos,
+                    row_filter, formats, memo_size)
+                # プロセス起動失敗等は最初のチャンク取得時に検出 → 逐次処理にフォールバック
+                first = next(chunks, None)
+                rows = parallel_parser.iter_rows(chain([first] if first else [], chunks), convert, row_filter, memo)
+            except Exception:
+                rows = None
+        if rows is None:
+            rows = iter_parsed_rows(csv_path, encoding, delimiter, header, idx_lat, idx_lon, keep_idx, convert,
+                                    ValueInterner(intern_pos), row_filter, formats, memo)
+
+        template = QgsFeature(sink.fields)
+        extent = ExtentTracker()
+        done = 0
+        for batch in iter_batches(rows, batch_size):
+            feats = []
+            append = feats.append
+            # 座標を持つ地物と座標配列 (形状はバッチ単位で一括生成)
+            located = []
+            xs = array('d')
+            ys = array('d')
+            for attrs, lat, lon, parse_error in batch:
+                feat = QgsFeature(template)
+                # 属性設定 (選択列のみ)
+                attrs.append(parse_error)
                 feat.setAttributes(attrs)
                 if lat is not None and lon is not None:
-                    feat.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(lon, lat)))
-                feats.append(feat)
-        pr.addFeatures(feats)
-        layer.updateExtents()
+                    located.append(feat)
+                    xs.append(lon)
+                    ys.append(lat)
+                append(feat)
+            for feat, geom in zip(located, point_geometries(xs, ys)):
+                feat.setGeometry(geom)
+            extent.add_all(xs, ys)
+            sink.add(feats)
+            done += len(feats)
+            if progress and total:
+                # フィルタ時は読んだ行数で進捗を出す
+                scanned = row_filter.seen if row_filter is not None else done
+                progress(min(100.0, scanned / total * 100.0))
+        layer = sink.finish()
+        extent.apply(layer)
+        self.type_mismatches = convert.mismatches
+        if memo is not None:
+            self.parse_cache_hits = memo.hits
+            self.parse_cache_misses = memo.misses
+        return layer
+
+    def _native_layer(self, csv_path: str, encoding: str, delimiter: str, lat_field: str, lon_field: str,
+                      layer_name: str, sample_rows, idx_lat: int, idx_lon: int,
+                      types: Optional[Sequence[str]] = None) -> Optional[QgsVectorLayer]:
+        """delimitedtext プロバイダのレイヤ。条件を満たさない/開けない場合は None (Python 解析へ)。
+
+        types (全列の検証済み型) を渡すとプロバイダの型判定を有効にする。判定が食い違うと見込まれる
+        列があれば開く前に None を返す (開いた後の食い違いは見込み外の場合のみ)。
+        """
+        codec = native_codec(encoding)
+        if codec is None or not is_plain(csv_path):
+            return None
+        if not plain_decimal_coordinates(sample_rows, idx_lat, idx_lon):
+            return None
+        if types and not native_types_agree(types, sample_rows):
+            return None
+        uri = delimitedtext_uri(csv_path, codec, delimiter, lat_field, lon_field, detect_types=bool(types))
+        layer = QgsVectorLayer(uri, layer_name, 'delimitedtext')
+        if not layer.isValid():
+            return None
+        if types:
+            flds = layer.fields()
+            if flds.count() != len(types):
+                return None
+            for i, t in enumerate(types):
+                if flds.at(i).type() != field_type(t):
+                    return None
+        # Python 解析と同じスキーマにする (補助列 _parse_error)
+        layer.addExpressionField(parse_error_expression(lat_field, lon_field),
+                                 QgsField('_parse_error', QVariant.String))
         return layer
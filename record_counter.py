@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""高速レコード件数カウント
+ファイルを mmap し、行終端 (\\n または \\r) を bytes.count でまとめて数える。
+圧縮ファイルは展開ストリームのチャンクに同じ処理を適用する。
+ダブルクォートを含むチャンクのみクォート状態を追跡し、クォート内の改行を除外する。
+- ASCII 互換エンコーディング (utf-8 / cp932 / euc-jp 等) のみ対象
+- UTF-16/32 やクォートの不整合 (ファイル末尾でクォートが閉じていない) は None を返し、
+  呼び出し側で csv.reader による通常カウントへフォールバックさせる。
+"""
+from __future__ import annotations
+import os
+import mmap
+import codecs
+from typing import Callable, Optional
+from .csv_source import is_plain, open_binary
+
+QUOTE = b'"'
+CHUNK_SIZE = 8 << 20
+
+# バイト単位の走査が成立しない (改行/クォートが 1 バイトでない) エンコーディング
+_WIDE_CODECS = ('utf-16', 'utf-32')
+
+
+def is_byte_countable(encoding: str) -> bool:
+    try:
+        name = codecs.lookup(encoding).name
+    except LookupError:
+        return False
+    return not name.startswith(_WIDE_CODECS)
+
+
+def _detect_terminator(head: bytes) -> bytes:
+    # 先頭行 (ヘッダ) の終端が単独 \r の (旧 Mac 形式) ファイルは \r を行終端とみなす
+    pos = head.find(b'\r')
+    if pos >= 0 and head[pos + 1:pos + 2] != b'\n' and b'\n' not in head[:pos]:
+        return b'\r'
+    return b'\n'
+
+
+def count_newlines(buf, terminator: bytes = b'\n', in_quotes: bool = False):
+    """buf 内のクォート外の行終端数と、走査後のクォート状態を返す。
+
+    クォートを含まないチャンクは bytes.count のみで処理する。含む場合は '"' で分割し、
+    クォート外にあたる断片だけを連結して数える ("" のエスケープは 2 回反転で相殺)。
+    """
+    if not in_quotes and QUOTE not in buf:
+        return buf.count(terminator), False
+    parts = buf.split(QUOTE)
+    outside = parts[1::2] if in_quotes else parts[0::2]
+    n = b''.join(outside).count(terminator)
+    if (len(parts) - 1) % 2:
+        in_quotes = not in_quotes
+    return n, in_quotes
+
+
+def estimate_records(head: bytes, file_size: int, encoding: str = 'utf-8', has_header: bool = True):
+    """先頭サンプルの平均行長とファイルサイズから件数を推定する。
+
+    (件数, 近似かどうか) を返す。サンプルがファイル全体を含む場合は正確な件数。
+    推定不能 (ワイドエンコーディング/完結した行が無い) の場合は (None, True)。
+    """
+    if not is_byte_countable(encoding):
+        return None, True
+    if not head:
+        return 0, False
+    terminator = _detect_terminator(head)
+    if len(head) >= file_size:
+        n, _ = count_newlines(head, terminator)
+        if head[-1:] not in (b'\n', b'\r'):
+            n += 1
+        if has_header and n:
+            n -= 1
+        return n, False
+    # 末尾の不完全な行を除き、ヘッダ行の長さは平均から除外する
+    body_start = head.find(terminator) + 1 if has_header else 0
+    body_end = head.rfind(terminator) + 1
+    if body_start <= 0 or body_end <= body_start:
+        return None, True
+    n, _ = count_newlines(head[body_start:body_end], terminator)
+    if n <= 0:
+        return None, True
+    avg = (body_end - body_start) / n
+    return max(n, int(round((file_size - body_start) / avg))), True
+
+
+def _count_chunks(chunks, has_header: bool, should_stop, progress) -> Optional[int]:
+    """(チャンク, 進捗%) の列からレコード数を数える。"""
+    terminator = None
+    total = 0
+    in_quotes = False
+    last = b''
+    for chunk, pct in chunks:
+        if should_stop and should_stop():
+            return None
+        if terminator is None:
+            terminator = _detect_terminator(chunk)
+        n, in_quotes = count_newlines(chunk, terminator, in_quotes)
+        total += n
+        last = chunk[-1:]
+        if progress:
+            progress(pct)
+    if in_quotes:
+        # クォート不整合: 正確な件数を保証できない
+        return None
+    # 末尾に改行が無い最終行もレコードとして数える
+    if last and last not in (b'\n', b'\r'):
+        total += 1
+    if has_header and total:
+        total -= 1
+    return total
+
+
+def _mmap_chunks(mm, size: int, chunk_size: int):
+    for start in range(0, size, chunk_size):
+        yield mm[start:start + chunk_size], min(100.0, (start + chunk_size) / size * 100.0)
+
+
+def _stream_chunks(src, size: int, chunk_size: int):
+    while True:
+        chunk = src.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk, (min(100.0, src.position() / size * 100.0) if size else 0.0)
+
+
+def count_records(path: str, encoding: str = 'utf-8', has_header: bool = True,
+                  should_stop: Optional[Callable[[], bool]] = None,
+                  progress: Optional[Callable[[float], None]] = None,
+                  chunk_size: int = CHUNK_SIZE) -> Optional[int]:
+    """CSV のレコード数 (has_header なら先頭行を除く) を返す。判定不能/中断時は None。
+
+    非圧縮ファイルは mmap、圧縮ファイルは展開ストリームをチャンク単位で数える。
+    """
+    if not is_byte_countable(encoding):
+        return None
+    size = os.path.getsize(path)
+    if size == 0:
+        return 0
+    if not is_plain(path):
+        with open_binary(path) as src:
+            return _count_chunks(_stream_chunks(src, size, chunk_size), has_header, should_stop, progress)
+    with open(path, 'rb') as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _count_chunks(_mmap_chunks(mm, size, chunk_size), has_header, should_stop, progress)
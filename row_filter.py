@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""行フィルタ (読込時の絞り込み)
+ドロップパネルで入力した抽出条件を CSV の読込ループ内で評価し、条件外の行は地物化・
+ジオコーディングしない。条件は型変換前の文字列行 (ヘッダ列数までパディング済み) に対して評価する。
+- 単純な列条件: `列 演算子 値` (演算子は = == != <> < <= > >=)。
+  列名は "..." で囲むと空白を含められる。値は '...' の文字列か、空白を含まない語
+  (列名と同じ語は QGIS 式と同じく列の参照として扱う)。
+  値が数値なら数値として比較 (数値でないセルは != のみ真)。Python だけで評価するため並列パーサのワーカーでも使える
+- それ以外: QGIS 式 (QgsExpression)。全列を文字列フィールドとして評価する (メインスレッドのみ)
+- seen は評価した行数 (進捗表示用)。並列パーサではワーカー側の件数を呼び出し側で加算する
+"""
+from __future__ import annotations
+import re
+import operator
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+
+try:
+    from qgis.core import (
+        QgsExpression,
+        QgsExpressionContext,
+        QgsExpressionContextUtils,
+        QgsFeature,
+        QgsFeatureRequest,
+        QgsField,
+        QgsFields,
+        QgsProject,
+    )
+    from qgis.PyQt.QtCore import QVariant
+except ImportError:  # 並列パーサのワーカー (QGIS 外の Python) では単純条件のみ
+    QgsExpression = None
+
+OPS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<>': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+}
+PREDICATE_RE = re.compile(
+    r'''^\s*(?:"(?P<qname>[^"]+)"|(?P<name>[^\s=!<>'"]+))\s*'''
+    r'''(?P<op>==|!=|<>|<=|>=|=|<|>)\s*'''
+    r'''(?:'(?P<text>(?:[^']|'')*)'|(?P<bare>[^\s'"]+))\s*$''')
+NUMBER_RE = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$')
+# 単純条件の値として扱わない語 (QGIS 式として評価する)
+KEYWORDS = {'NULL', 'TRUE', 'FALSE'}
+
+
+class RowFilter(ABC):
+    """行 (文字列リスト) を受け取り、残すなら True を返すフィルタの基底。"""
+
+    def __init__(self):
+        self.seen = 0
+
+    def __call__(self, row: List[str]) -> bool:
+        self.seen += 1
+        return self.test(row)
+
+    @abstractmethod
+    def test(self, row: List[str]) -> bool:
+        """行を残すなら True。"""
+
+
+class ColumnPredicate(RowFilter):
+    """列 index の値と定数の比較。pickle 可能 (並列パーサのワーカーへ渡す)。"""
+
+    def __init__(self, index: int, op: str, value: str, number: Optional[float] = None):
+        super().__init__()
+        self.index = index
+        self.op = op
+        self.value = value
+        self.number = number
+
+    def test(self, row: List[str]) -> bool:
+        cell = row[self.index].strip()
+        compare = OPS[self.op]
+        if self.number is not None:
+            try:
+                return compare(float(cell), self.number)
+            except ValueError:
+                return compare is operator.ne
+        return compare(cell, self.value)
+
+
+class ExpressionFilter(RowFilter):
+    """QGIS 式で評価するフィルタ。全列を文字列フィールドとして扱う。"""
+
+    def __init__(self, text: str, header: Sequence[str]):
+        super().__init__()
+        if QgsExpression is None:
+            raise ValueError('QGIS 式はこの環境では評価できません')
+        expr = QgsExpression(text)
+        if expr.hasParserError():
+            raise ValueError(expr.parserErrorString())
+        unknown = sorted(c for c in expr.referencedColumns()
+                         if c not in header and c != QgsFeatureRequest.ALL_ATTRIBUTES)
+        if unknown:
+            raise ValueError('列がありません: ' + ', '.join(unknown))
+        fields = QgsFields()
+        for name in header:
+            fields.append(QgsField(name, QVariant.String))
+        self._ncols = len(header)
+        self._feature = QgsFeature(fields)
+        self._context = QgsExpressionContext()
+        self._context.appendScope(QgsExpressionContextUtils.globalScope())
+        self._context.appendScope(QgsExpressionContextUtils.projectScope(QgsProject.instance()))
+        self._context.setFields(fields)
+        expr.prepare(self._context)
+        self._expr = expr
+
+    def test(self, row: List[str]) -> bool:
+        self._feature.setAttributes(row if len(row) == self._ncols else row[:self._ncols])
+        self._context.setFeature(self._feature)
+        value = self._expr.evaluate(self._context)
+        if self._expr.hasEvalError():
+            return False
+        return bool(value)
+
+
+def parse_predicate(text: str, header: Sequence[str]) -> Optional[ColumnPredicate]:
+    """単純な列条件として解釈できれば ColumnPredicate、できなければ None。"""
+    m = PREDICATE_RE.match(text)
+    if not m:
+        return None
+    name = m.group('qname') or m.group('name')
+    if name not in header:
+        return None
+    if m.group('text') is not None:
+        return ColumnPredicate(list(header).index(name), m.group('op'), m.group('text').replace("''", "'"))
+    bare = m.group('bare')
+    # 予約語や列名 (QGIS 式では列参照。数値は式でも数値) は単純条件にしない
+    is_number = bool(NUMBER_RE.match(bare))
+    if bare.upper() in KEYWORDS or (bare in header and not is_number):
+        return None
+    number = float(bare) if is_number else None
+    return ColumnPredicate(list(header).index(name), m.group('op'), bare, number)
+
+
+def compile_filter(text: Optional[str], header: Sequence[str]) -> Optional[RowFilter]:
+    """抽出条件の文字列からフィルタを作る。空なら None。式が不正なら ValueError。"""
+    text = (text or '').strip()
+    if not text:
+        return None
+    return parse_predicate(text, header) or ExpressionFilter(text, header)
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+"""行オフセット索引 (行番号 → バイト位置)
+非圧縮 CSV のデータ行 stride 件ごとの先頭バイト位置を array('Q') で保持し、
+任意の行へ先頭から読み直さずにシークできるようにする。
+- 初回走査 (件数カウントの mmap パス) で RowIndexBuilder にチャンクを渡して構築
+- クォート内の改行はレコード境界として扱わない
+- InspectionCache のエントリ横に <key>.idx として保存し、再ドロップ時に再利用
+"""
+from __future__ import annotations
+import io
+import csv
+import sys
+import struct
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Iterator, List, Optional, Tuple
+
+from .record_counter import _detect_terminator
+
+DEFAULT_STRIDE = 256
+MAGIC = b'CTPRIDX1'
+_HEADER = struct.Struct('<QQQQ')  # stride, record_count, file_size, offset 数
+QUOTE = b'"'
+
+
+class RowIndex:
+    """offsets[i] はデータ行 i * stride (0 始まり、ヘッダ除く) の先頭バイト位置。"""
+
+    def __init__(self, stride: int, offsets: array, record_count: int, file_size: int):
+        self.stride = stride
+        self.offsets = offsets
+        self.record_count = record_count
+        self.file_size = file_size
+
+    def locate(self, row: int) -> Tuple[int, int]:
+        """データ行 row を読むための (シーク位置, そこから読み飛ばす行数)。"""
+        if row < 0 or row >= self.record_count:
+            raise IndexError(row)
+        i = min(row // self.stride, len(self.offsets) - 1)
+        return self.offsets[i], row - i * self.stride
+
+    def iter_rows(self, path: str, encoding: str, delimiter: str, start_row: int = 0) -> Iterator[List[str]]:
+        """データ行 start_row 以降を csv.reader の行として返す。"""
+        offset, skip = self.locate(start_row)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            text = io.TextIOWrapper(f, encoding=encoding, errors='replace', newline='')
+            reader = csv.reader(text, delimiter=delimiter)
+            for _ in range(skip):
+                if next(reader, None) is None:
+                    return
+            yield from reader
+
+    def split(self, n_parts: int) -> List[Tuple[int, int]]:
+        """行境界に揃えたおおよそ等行数の (開始, 終了) バイト範囲に分割する。"""
+        n = len(self.offsets)
+        if n == 0:
+            return []
+        step = max(1, n // max(1, n_parts))
+        starts = [self.offsets[i] for i in range(0, n, step)]
+        ends = starts[1:] + [self.file_size]
+        return [(a, b) for a, b in zip(starts, ends) if b > a]
+
+    # ---- 永続化 ----
+    def save(self, path: str) -> None:
+        data = array('Q', self.offsets)
+        if sys.byteorder != 'little':
+            data.byteswap()
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_HEADER.pack(self.stride, self.record_count, self.file_size, len(data)))
+            f.write(data.tobytes())
+
+    @classmethod
+    def load(cls, path: str) -> Optional['RowIndex']:
+        try:
+            with open(path, 'rb') as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return None
+                stride, record_count, file_size, n = _HEADER.unpack(f.read(_HEADER.size))
+                data = array('Q')
+                data.frombytes(f.read(n * data.itemsize))
+        except (OSError, struct.error, ValueError):
+            return None
+        if len(data) != n or stride <= 0:
+            return None
+        if sys.byteorder != 'little':
+            data.byteswap()
+        return cls(stride, data, record_count, file_size)
+
+
+class RowIndexBuilder:
+    """連続したバイトチャンクを feed() で受け取り、行オフセット索引を作る。"""
+
+    def __init__(self, stride: int = DEFAULT_STRIDE, has_header: bool = True):
+        self.stride = stride
+        self.offsets = array('Q')
+        self._terminator = None
+        self._in_quotes = False
+        self._pos = 0
+        self._last = b''
+        # 次に終端するレコード番号 (-1 はヘッダ)
+        self._record = -1 if has_header else 0
+        if not has_header:
+            self.offsets.append(0)
+
+    def _add_ends(self, buf: bytes, start: int, stop: int, base: int, locate=None) -> None:
+        """buf[start:stop] (クォート外) の終端を数え、stride 件ごとのレコード先頭を記録する。
+
+        終端は bytes.count でまとめて数え、記録する終端の位置だけを探す。平均行長から
+        stride 件先を見込んで count し、行き過ぎた分を rfind で戻す (行ごとの Python 処理をしない)。
+        locate があれば、記録する位置を buf 上の位置からチャンク上の位置へ変換する。
+        """
+        term = self._terminator
+        tlen = len(term)
+        remaining = buf.count(term, start, stop)
+        if not remaining:
+            return
+        # レコード r の終端 = レコード r+1 の先頭。r+1 が stride の倍数なら記録
+        k = (-self._record - 1) % self.stride + 1  # 区間内で次に記録する終端の番号 (1 始まり)
+        self._record += remaining
+        avg = max(tlen, (stop - start) // remaining)
+        pos = start
+        while k <= remaining:
+            end = pos
+            n = 0
+            while n < k:
+                nxt = min(stop, end + max(tlen, (k - n) * avg))
+                n += buf.count(term, end, nxt)
+                end = nxt
+            for _ in range(n - k):
+                end = buf.rfind(term, pos, end)
+            # buf[pos:end] にちょうど k 個。最後の終端の直後が記録するレコードの先頭
+            end = buf.rfind(term, pos, end) + tlen
+            self.offsets.append(base + (locate(end) if locate else end))
+            pos = end
+            remaining -= k
+            k = self.stride
+
+    def feed(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self._terminator is None:
+            self._terminator = _detect_terminator(chunk)
+        base = self._pos
+        if not self._in_quotes and chunk.find(QUOTE) < 0:
+            self._add_ends(chunk, 0, len(chunk), base)
+        else:
+            # count_newlines と同じく '"' で分割し、クォート外の断片を連結してまとめて数える。
+            # 記録する (stride 件ごとの) 位置だけを連結上の位置からチャンク上の位置へ戻す
+            parts = chunk.split(QUOTE)
+            first = 1 if self._in_quotes else 0
+            # 各断片のチャンク上の開始位置と、クォート外断片の連結上の終了位置
+            heads = [0] + list(accumulate(len(part) + 1 for part in parts))
+            starts = heads[first:-1:2]
+            ends = list(accumulate(map(len, parts[first::2])))
+            outside = b''.join(parts[first::2])
+
+            def locate(p):
+                # 断片末尾ちょうどの位置は次のクォートの位置 (次の断片の先頭ではない)
+                i = bisect_left(ends, p)
+                return starts[i] + p - (ends[i - 1] if i else 0)
+
+            self._add_ends(outside, 0, len(outside), base, locate)
+            if (len(parts) - 1) % 2:
+                self._in_quotes = not self._in_quotes
+        self._pos += len(chunk)
+        self._last = chunk[-1:]
+
+    def finish(self) -> Optional[RowIndex]:
+        """索引を返す。クォートが閉じずに終わった場合は None。"""
+        if self._in_quotes:
+            return None
+        size = self._pos
+        count = self._record
+        # 末尾に改行が無い最終行もレコードとして数える
+        if self._last and self._last not in (b'\n', b'\r'):
+            count += 1
+        offsets = self.offsets
+        while offsets and offsets[-1] >= size:
+            offsets.pop()
+        return RowIndex(self.stride, offsets, max(0, count), size)
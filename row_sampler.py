@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""行サンプリング (フィールド判定・型推定・座標形式の分析用)
+ファイルサイズによらず一定時間で、データ行から K 行の一様ランダムサンプルを取る。
+- 行オフセット索引 (row_index) があれば行番号を一様に選び、索引ブロック単位でシークして読む
+- 索引の無い非圧縮ファイルはランダムなバイト位置へシークし、直後の完全なレコードを採用
+  (長い行ほど選ばれやすい近似。クォート内に着地して列数が合わない行は捨てる)
+- 圧縮/ワイド文字エンコーディングはシーク不可のため、先頭 STREAM_LIMIT 行でリザーバサンプリング
+- ドロップ直後の即時判定 (GUI スレッド) は QUICK_* の小さなサンプルに抑え、
+  DEFAULT_SAMPLE_SIZE 行のサンプルは全体走査のタスク (バックグラウンド) で取り直す
+"""
+from __future__ import annotations
+import io
+import os
+import csv
+import random
+from typing import List, Optional, Sequence
+
+from .csv_source import is_plain, open_text
+from .record_counter import is_byte_countable, _detect_terminator
+
+DEFAULT_SAMPLE_SIZE = 1000
+# これ以下のファイルは全行を読んでからサンプリング
+SMALL_FILE_BYTES = 1 << 20
+# シーク 1 回あたりの読込量 (1 レコードがこれを超える場合は捨てる)
+SEEK_BLOCK = 65536
+# ストリーミング時に読む最大行数
+STREAM_LIMIT = 200_000
+# 即時判定用 (GUI スレッド) のサンプル行数とストリーミング時の最大行数
+QUICK_SAMPLE_SIZE = 200
+QUICK_STREAM_LIMIT = 5000
+QUOTE = b'"'
+
+
+def _pad(row: List[str], ncols: int) -> List[str]:
+    if len(row) < ncols:
+        row.extend([''] * (ncols - len(row)))
+    return row
+
+
+def _data_start(path: str) -> int:
+    """ヘッダレコード直後のバイト位置 (クォート内改行を考慮)。"""
+    with open(path, 'rb') as f:
+        head = f.read(SEEK_BLOCK)
+    terminator = _detect_terminator(head)
+    pos = 0
+    quotes = 0
+    while True:
+        nl = head.find(terminator, pos)
+        if nl < 0:
+            return len(head)
+        quotes += head.count(QUOTE, pos, nl)
+        pos = nl + len(terminator)
+        if quotes % 2 == 0:
+            return pos
+
+
+def _reservoir(rows, k: int, rng: random.Random, limit: int) -> List[List[str]]:
+    """Algorithm R: 先頭 limit 行から k 行を一様に選ぶ。"""
+    sample: List[List[str]] = []
+    for i, row in enumerate(rows):
+        if i >= limit:
+            break
+        if i < k:
+            sample.append(row)
+        else:
+            j = rng.randint(0, i)
+            if j < k:
+                sample[j] = row
+    return sample
+
+
+def _sample_stream(path: str, encoding: str, delimiter: str, k: int, rng: random.Random, limit: int) -> List[List[str]]:
+    with open_text(path, encoding) as f:
+        reader = csv.reader(f, delimiter=delimiter)
+        next(reader, None)  # skip header
+        return _reservoir((r for r in reader if r), k, rng, limit)
+
+
+def _sample_indexed(path: str, encoding: str, delimiter: str, k: int, rng: random.Random, row_index) -> List[List[str]]:
+    count = row_index.record_count
+    wanted = sorted(rng.sample(range(count), min(k, count)))
+    offsets = row_index.offsets
+    stride = row_index.stride
+    sample: List[List[str]] = []
+    with open(path, 'rb') as f:
+        i = 0
+        while i < len(wanted):
+            block = min(wanted[i] // stride, len(offsets) - 1)
+            start = offsets[block]
+            end = offsets[block + 1] if block + 1 < len(offsets) else row_index.file_size
+            f.seek(start)
+            text = f.read(end - start).decode(encoding, errors='replace')
+            rows = list(csv.reader(io.StringIO(text, newline=''), delimiter=delimiter))
+            base = block * stride
+            while i < len(wanted) and min(wanted[i] // stride, len(offsets) - 1) == block:
+                j = wanted[i] - base
+                if j < len(rows) and rows[j]:
+                    sample.append(rows[j])
+                i += 1
+    return sample
+
+
+def _sample_by_seek(path: str, encoding: str, delimiter: str, ncols: int, k: int, rng: random.Random) -> List[List[str]]:
+    size = os.path.getsize(path)
+    start = _data_start(path)
+    if start >= size:
+        return []
+    with open(path, 'rb') as f:
+        terminator = _detect_terminator(f.read(SEEK_BLOCK))
+        seen = set()
+        sample: List[List[str]] = []
+        # 列数不一致で捨てる分を見込んで多めに試行
+        for _ in range(k * 2):
+            if len(sample) >= k:
+                break
+            off = rng.randrange(start, size)
+            f.seek(max(start, off - 1))
+            raw = f.read(SEEK_BLOCK)
+            nl = raw.find(terminator)
+            if nl < 0:
+                continue
+            rec_start = max(start, off - 1) + nl + len(terminator)
+            if rec_start >= size or rec_start in seen:
+                continue
+            seen.add(rec_start)
+            body = raw[nl + len(terminator):]
+            text = body.decode(encoding, errors='replace')
+            reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+            try:
+                row = next(reader, None)
+                # ブロック内で完結しているレコードのみ採用 (ファイル末尾は例外)
+                complete = rec_start + len(body) >= size or next(reader, None) is not None
+            except csv.Error:
+                continue
+            if row and complete and len(row) == ncols:
+                sample.append(row)
+    return sample
+
+
+def sample_rows(path: str, encoding: str, delimiter: str, header: Sequence[str],
+                k: int = DEFAULT_SAMPLE_SIZE, row_index=None, seed: Optional[int] = None,
+                stream_limit: int = STREAM_LIMIT) -> List[List[str]]:
+    """データ行 (ヘッダ除く) から最大 k 行のサンプルを返す。各行はヘッダ列数までパディング済み。
+
+    stream_limit はシークできないファイル (圧縮/ワイド文字) で先頭から読む最大行数。
+    """
+    rng = random.Random(seed)
+    ncols = len(header)
+    plain = is_plain(path) and is_byte_countable(encoding)
+    if plain and row_index is not None and row_index.record_count and row_index.file_size == os.path.getsize(path):
+        rows = _sample_indexed(path, encoding, delimiter, k, rng, row_index)
+    elif plain and os.path.getsize(path) > SMALL_FILE_BYTES:
+        rows = _sample_by_seek(path, encoding, delimiter, ncols, k, rng)
+    else:
+        rows = _sample_stream(path, encoding, delimiter, k, rng, stream_limit if not plain else float('inf'))
+    return [_pad(r, ncols) for r in rows]
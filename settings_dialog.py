@@ -7,6 +7,7 @@ from qgis.PyQt import uic
 from qgis.PyQt.QtWidgets import QDialog
 from .settings_store import SettingsStore
 from .provider_registry import iter_providers
+from .layer_output import OUTPUT_FORMATS
 from .field_detector import LAT_KEYWORDS, LON_KEYWORDS, ADDR_KEYWORDS, INITIAL_CUSTOM_KEYWORDS
 
 
@@ -60,6 +61,17 @@ class SettingsDialog(QDialog, FORM_CLASS):
         self.sync_threshold_spin.setValue(self.store.get_sync_threshold())
         self.sync_all_check.setChecked(self.store.get_sync_all())
 
+        # 処理性能
+        self.parallel_workers_spin.setValue(self.store.get_parallel_workers())
+        self.parse_cache_spin.setValue(self.store.get_parse_cache_size())
+        self.index_min_spin.setValue(self.store.get_index_min_features())
+        self.output_format_combo.clear()
+        for fmt, label in OUTPUT_FORMATS:
+            self.output_format_combo.addItem(self.tr(label), fmt)
+        idx = self.output_format_combo.findData(self.store.get_output_format())
+        self.output_format_combo.setCurrentIndex(max(0, idx))
+        self.output_dir_edit.setText(self.store.get_output_dir())
+
         # シグナル接続
         self.provider_combo.currentIndexChanged.connect(self._on_provider_changed)
         self._on_provider_changed(self.provider_combo.currentIndex())
@@ -99,6 +111,11 @@ class SettingsDialog(QDialog, FORM_CLASS):
         s.set_api_key(_clean(self.api_key_edit.text()))
         s.set_sync_threshold(self.sync_threshold_spin.value())
         s.set_sync_all(self.sync_all_check.isChecked())
+        s.set_parallel_workers(self.parallel_workers_spin.value())
+        s.set_parse_cache_size(self.parse_cache_spin.value())
+        s.set_index_min_features(self.index_min_spin.value())
+        s.set_output_format(self.output_format_combo.currentData())
+        s.set_output_dir(_clean(self.output_dir_edit.text()))
         s.set_mapbox_token(_clean(self.mapbox_token_edit.text()))
         s.set_opencage_key(_clean(self.opencage_key_edit.text()))
         s.set_here_apikey(_clean(self.here_key_edit.text()))
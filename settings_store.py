@@ -25,10 +25,21 @@ class SettingsStore:
     KEY_CUSTOM_LAT_KW = 'detect/custom_lat_keywords'
     KEY_CUSTOM_LON_KW = 'detect/custom_lon_keywords'
     KEY_CUSTOM_ADDR_KW = 'detect/custom_addr_keywords'
+    # 処理性能
+    KEY_PARALLEL_WORKERS = 'performance/parallel_workers'
+    KEY_PARSE_CACHE_SIZE = 'performance/parse_cache_size'
+    KEY_INDEX_MIN_FEATURES = 'performance/index_min_features'
+    # 出力先
+    KEY_OUTPUT_FORMAT = 'output/format'
+    KEY_OUTPUT_DIR = 'output/directory'
 
     DEFAULT_USER_AGENT = 'CsvToPointsPlugin/0.1 (set your email)'
     DEFAULT_PROVIDER = 'nominatim'
     DEFAULT_SYNC_THRESHOLD = 10
+    DEFAULT_PARALLEL_WORKERS = 0  # 0 = 自動 (CPU コア数 - 1)
+    DEFAULT_PARSE_CACHE_SIZE = 65536  # 0 = 無効
+    DEFAULT_INDEX_MIN_FEATURES = 10000  # 0 = 常に作成
+    DEFAULT_OUTPUT_FORMAT = 'memory'
 
     def get_user_agent(self) -> str:
         return self.qs.value(self.KEY_USER_AGENT, self.DEFAULT_USER_AGENT, type=str)
@@ -67,6 +78,40 @@ class SettingsStore:
     def set_sync_all(self, flag: bool):
         self.qs.setValue(self.KEY_SYNC_ALL, 1 if flag else 0)
 
+    def get_parallel_workers(self) -> int:
+        return int(self.qs.value(self.KEY_PARALLEL_WORKERS, self.DEFAULT_PARALLEL_WORKERS))
+
+    def set_parallel_workers(self, val: int):
+        self.qs.setValue(self.KEY_PARALLEL_WORKERS, val)
+
+    def get_parse_cache_size(self) -> int:
+        return int(self.qs.value(self.KEY_PARSE_CACHE_SIZE, self.DEFAULT_PARSE_CACHE_SIZE))
+
+    def set_parse_cache_size(self, val: int):
+        self.qs.setValue(self.KEY_PARSE_CACHE_SIZE, val)
+
+    def get_index_min_features(self) -> int:
+        return int(self.qs.value(self.KEY_INDEX_MIN_FEATURES, self.DEFAULT_INDEX_MIN_FEATURES))
+
+    def set_index_min_features(self, val: int):
+        self.qs.setValue(self.KEY_INDEX_MIN_FEATURES, val)
+
+    def get_output_format(self) -> str:
+        return self.qs.value(self.KEY_OUTPUT_FORMAT, self.DEFAULT_OUTPUT_FORMAT, type=str)
+
+    def set_output_format(self, val: str):
+        self.qs.setValue(self.KEY_OUTPUT_FORMAT, val)
+
+    def get_output_dir(self) -> str:
+        return self.qs.value(self.KEY_OUTPUT_DIR, '', type=str)
+
+    def set_output_dir(self, val: str):
+        # 空なら CSV と同じフォルダ
+        if not val:
+            self.qs.remove(self.KEY_OUTPUT_DIR)
+        else:
+            self.qs.setValue(self.KEY_OUTPUT_DIR, val)
+
     def export_all(self) -> dict:
         return {
             'user_agent': self.get_user_agent(),
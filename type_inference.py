@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+"""列の型推定と値の変換
+サンプル行 (row_sampler) から列ごとに int / int64 / double / date / bool / string を推定し、
+ビルド時に文字列を型付きの値へ変換する。
+- 空文字は NULL (None)。string 列の空文字はそのまま
+- 先頭ゼロ付きの整数 (郵便番号・コード類) は string のまま
+- 推定型はサンプルからの仮決定。TypeValidator で全行を検証し、合わない値がある列は
+  値を保持できる型 (int → int64 → double → string) へ広げてからフィールドを作る
+- 検証後にファイルが変わった等で変換できない値は NULL にし、件数と内容を呼び出し側へ返す
+- QGIS モジュールに依存しない (並列パーサのワーカーでも使用)
+"""
+from __future__ import annotations
+import re
+import datetime
+from typing import Callable, Dict, List, Optional, Sequence
+
+TYPE_STRING = 'string'
+TYPE_INT = 'int'
+TYPE_INT64 = 'int64'
+TYPE_DOUBLE = 'double'
+TYPE_DATE = 'date'
+TYPE_BOOL = 'bool'
+
+INT_RE = re.compile(r'^[-+]?\d+$')
+DOUBLE_RE = re.compile(r'^[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?$')
+DATE_RE = re.compile(r'^(\d{4})[-/](\d{1,2})[-/](\d{1,2})$')
+BOOL_VALUES = {
+    'true': True, 'false': False,
+    'yes': True, 'no': False,
+    't': True, 'f': False,
+}
+INT32_MAX = 2 ** 31 - 1
+INT64_MAX = 2 ** 63 - 1
+# サンプルの最大値がこれ未満なら int (32bit)、以上なら int64 (サンプル外の大きな値に備えた余裕)
+INT32_SAFE = 10 ** 8
+
+
+def _has_leading_zero(v: str) -> bool:
+    digits = v.lstrip('+-')
+    return len(digits) > 1 and digits[0] == '0'
+
+
+def to_int(v: str) -> int:
+    if not INT_RE.match(v):
+        raise ValueError(v)
+    n = int(v)
+    if abs(n) > INT32_MAX:
+        raise ValueError(v)
+    return n
+
+
+def to_int64(v: str) -> int:
+    if not INT_RE.match(v):
+        raise ValueError(v)
+    n = int(v)
+    if abs(n) > INT64_MAX:
+        raise ValueError(v)
+    return n
+
+
+def to_double(v: str) -> float:
+    if not DOUBLE_RE.match(v):
+        raise ValueError(v)
+    return float(v)
+
+
+def to_date(v: str) -> datetime.date:
+    m = DATE_RE.match(v)
+    if not m:
+        raise ValueError(v)
+    return datetime.date(int(m.group(1)), int(m.group(2)), int(m.group(3)))
+
+
+def to_bool(v: str) -> bool:
+    try:
+        return BOOL_VALUES[v.lower()]
+    except KeyError:
+        raise ValueError(v) from None
+
+
+CONVERTERS: Dict[str, Callable[[str], object]] = {
+    TYPE_INT: to_int,
+    TYPE_INT64: to_int64,
+    TYPE_DOUBLE: to_double,
+    TYPE_DATE: to_date,
+    TYPE_BOOL: to_bool,
+}
+
+
+def infer_type(values: Sequence[str]) -> str:
+    """非空の値のリストから型を推定する。判定できなければ string。"""
+    values = [v for v in values if v != '']
+    if not values:
+        return TYPE_STRING
+    if all(v.lower() in BOOL_VALUES for v in values):
+        return TYPE_BOOL
+    if all(INT_RE.match(v) for v in values):
+        if any(_has_leading_zero(v) for v in values):
+            return TYPE_STRING
+        biggest = max(abs(int(v)) for v in values)
+        if biggest < INT32_SAFE:
+            return TYPE_INT
+        return TYPE_INT64 if biggest <= INT64_MAX else TYPE_STRING
+    if all(DOUBLE_RE.match(v) for v in values):
+        if any(_has_leading_zero(v.split('.')[0]) for v in values):
+            return TYPE_STRING
+        return TYPE_DOUBLE
+    try:
+        for v in values:
+            to_date(v)
+    except ValueError:
+        return TYPE_STRING
+    return TYPE_DATE
+
+
+def infer_column_types(header: Sequence[str], rows: Sequence[Sequence[str]]) -> List[str]:
+    """ヘッダ順の列型リスト。サンプルが無ければ全列 string。"""
+    return [infer_type([r[i] for r in rows if i < len(r)]) if rows else TYPE_STRING
+            for i in range(len(header))]
+
+
+def widen_type(t: str, v: str) -> str:
+    """値 v を失わずに保持できる、t 以上で最も狭い型。"""
+    if v == '' or t == TYPE_STRING:
+        return t
+    if t in (TYPE_INT, TYPE_INT64):
+        if INT_RE.match(v):
+            if _has_leading_zero(v):
+                return TYPE_STRING
+            n = abs(int(v))
+            if t == TYPE_INT and n <= INT32_MAX:
+                return TYPE_INT
+            # int64 を超える整数は double にすると桁が落ちるため string
+            return TYPE_INT64 if n <= INT64_MAX else TYPE_STRING
+        t = TYPE_DOUBLE
+    if t == TYPE_DOUBLE:
+        if DOUBLE_RE.match(v) and not _has_leading_zero(v.split('.')[0]):
+            return TYPE_DOUBLE
+        return TYPE_STRING
+    try:
+        CONVERTERS[t](v)
+    except ValueError:
+        return TYPE_STRING
+    return t
+
+
+class TypeValidator:
+    """全行の値で推定型を検証し、合わない値が現れた列の型を広げる。
+
+    行を順に渡して呼び出し、最後に types (ヘッダ順の検証済み型) を使う。
+    """
+
+    def __init__(self, types: Sequence[str]):
+        self.types = list(types)
+        self._targets = [i for i, t in enumerate(self.types) if t != TYPE_STRING]
+
+    def __bool__(self) -> bool:
+        return bool(self._targets)
+
+    def __call__(self, row: Sequence[str]) -> None:
+        types = self.types
+        widened = False
+        for i in self._targets:
+            if i >= len(row):
+                continue
+            t = types[i]
+            wider = widen_type(t, row[i])
+            if wider != t:
+                types[i] = wider
+                widened = True
+        if widened:
+            self._targets = [i for i in self._targets if types[i] != TYPE_STRING]
+
+
+class RowConverter:
+    """型リスト (変換対象の列順) に従って値リストをその場で変換する。
+
+    変換できない値は None にし、mismatches に件数を加算する。
+    """
+
+    def __init__(self, types: Sequence[str], names: Optional[Sequence[str]] = None):
+        self.names = list(names) if names is not None else [str(i) for i in range(len(types))]
+        self._targets = [(i, CONVERTERS[t]) for i, t in enumerate(types) if t in CONVERTERS]
+        self.mismatches = 0
+
+    def __bool__(self) -> bool:
+        return bool(self._targets)
+
+    def __call__(self, values: list) -> str:
+        """変換し、不一致があれば最初の不一致の説明を返す (無ければ空文字)。"""
+        err = ''
+        for i, conv in self._targets:
+            v = values[i]
+            if v == '':
+                values[i] = None
+                continue
+            try:
+                values[i] = conv(v)
+            except ValueError:
+                values[i] = None
+                self.mismatches += 1
+                if not err:
+                    err = f'型不一致: {self.names[i]}={v!r}'
+        return err
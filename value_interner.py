@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""低カーディナリティ列の値の共有 (インターン)
+都道府県・種別・ステータスのように少数の値が大量の行で繰り返される列では、csv.reader が
+セルごとに別の str を作るため、同じ内容の文字列がバッチ中に行数分だけ残る。
+- 検出: ドロップ時のサンプル行で列ごとの異なり数を数え、閾値以下の列を低カーディナリティとする
+- ビルド: 該当列の値を列ごとの辞書で正規化し、同じ値は 1 つの str オブジェクトを共有する
+- 並列パーサではワーカー側で正規化する (pickle のメモ化により転送量も減る)
+- サンプルの見積りが外れて値の種類が TABLE_LIMIT を超えた列は、以降インターンしない
+- QGIS モジュールに依存しない
+"""
+from __future__ import annotations
+from typing import Dict, List, Sequence
+
+# サンプル内の異なり数がこれ以下、かつ非空件数に対する比率が LOW_CARDINALITY_RATIO 以下なら対象
+LOW_CARDINALITY_MAX = 256
+LOW_CARDINALITY_RATIO = 0.2
+# 判定に必要な最小の非空件数 (小さなサンプルでは判定しない)
+MIN_SAMPLE = 20
+# 1 列あたりの辞書の上限
+TABLE_LIMIT = 65536
+
+
+def column_cardinality(header: Sequence[str], rows: Sequence[Sequence[str]]) -> List[Dict[str, int]]:
+    """列ごとの非空件数と異なり数。"""
+    stats = []
+    for i in range(len(header)):
+        values = [r[i] for r in rows if i < len(r) and r[i] != '']
+        stats.append({'non_empty': len(values), 'distinct': len(set(values))})
+    return stats
+
+
+def low_cardinality_columns(header: Sequence[str], rows: Sequence[Sequence[str]]) -> List[str]:
+    """サンプルで値の種類が少ないと判定した列名 (ヘッダ順)。"""
+    cols = []
+    for name, st in zip(header, column_cardinality(header, rows)):
+        n = st['non_empty']
+        if n >= MIN_SAMPLE and st['distinct'] <= LOW_CARDINALITY_MAX and st['distinct'] <= n * LOW_CARDINALITY_RATIO:
+            cols.append(name)
+    return cols
+
+
+class ValueInterner:
+    """値リストの指定位置の値を、列ごとに同一オブジェクトへ置き換える。"""
+
+    def __init__(self, positions: Sequence[int]):
+        self._tables = [(i, {}) for i in positions]
+
+    def __bool__(self) -> bool:
+        return bool(self._tables)
+
+    def __call__(self, values: list) -> None:
+        full = False
+        for i, table in self._tables:
+            v = values[i]
+            shared = table.get(v)
+            if shared is not None:
+                values[i] = shared
+            elif len(table) < TABLE_LIMIT:
+                table[v] = v
+            else:
+                full = True
+        if full:
+            self._tables = [(i, t) for i, t in self._tables if len(t) < TABLE_LIMIT]